@@ -1,8 +1,9 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required
-from dotenv import load_dotenv
 from database.db import init_app
+from utils import http_cache, invalidation, log, metrics, profiler
+from utils.json_provider import FastJSONProvider
 import os
 from flask import request, make_response
 # Import routes
@@ -15,12 +16,18 @@ from routes.cart import cart_bp
 from routes.wishlist import wishlist_bp
 from routes.reviews import reviews_bp
 from routes.loyalty import loyalty_bp
+from routes.profiling import profiling_bp
+from routes.batch import batch_bp
+from routes.categories import categories_bp
+from models import category
 
 def create_app():
     app = Flask(__name__)
+    # orjson-backed serializer for RealDictCursor rows (stdlib fallback)
+    app.json = FastJSONProvider(app)
     
-    # Load environment variables
-    load_dotenv()
+    # Environment variables are loaded from .env once, when database.db is
+    # imported above
     
     # Configure CORS with specific settings
     CORS(app, 
@@ -45,7 +52,12 @@ def create_app():
     
     # Initialize extensions
     jwt = JWTManager(app)
+    log.init_app(app)
     init_app(app)
+    http_cache.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    invalidation.init_app(app)
     
     # JWT Error Handlers
     @jwt.expired_token_loader
@@ -79,6 +91,9 @@ def create_app():
     app.register_blueprint(wishlist_bp, url_prefix='/api/wishlist')
     app.register_blueprint(reviews_bp, url_prefix='/api/reviews')
     app.register_blueprint(loyalty_bp, url_prefix='/api/loyalty')
+    app.register_blueprint(profiling_bp, url_prefix='/api/admin/profiling')
+    app.register_blueprint(batch_bp, url_prefix='/api/batch')
+    app.register_blueprint(categories_bp, url_prefix='/api/categories')
     
     # Error handlers
     @app.errorhandler(404)
@@ -89,6 +104,9 @@ def create_app():
     def server_error(error):
         return jsonify({'success': False, 'message': 'Internal server error'}), 500
     
+    # Near-static reference data, loaded once (before forking under gunicorn)
+    category.warm()
+    
     # Health check endpoint
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -96,6 +114,7 @@ def create_app():
     
     return app
 
+# Development server only; production runs under gunicorn (gunicorn.conf.py)
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True)
\ No newline at end of file
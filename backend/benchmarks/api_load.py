@@ -0,0 +1,251 @@
+"""End-to-end API load benchmark.
+
+Starts the app under gunicorn with gunicorn.conf.py (or targets --url), drives a weighted
+mix of workloads from concurrent closed-loop clients and reports p50, p95,
+p99 and req/s per endpoint. Expects a database seeded by scripts.seed_data
+with the same --stores/--products/--customers values.
+
+    python -m benchmarks.api_load --duration 60 --clients 32 --output bench.json
+    python -m benchmarks.api_load --baseline before.json --output after.json
+
+Workloads (weights set with --mix browse=60,search=20,login=10,cart=10):
+  browse    store list, a store page and that store's products
+  search    product search by keyword
+  login     POST /api/auth/login
+  cart      add to cart, view cart
+
+Placing orders is not benchmarked: POST /api/orders/ is still a placeholder
+that returns a constant response without touching the database.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, quote
+
+from scripts.seed_data import seed_id, seed_email, PASSWORD, WORDS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Client:
+    """Keep-alive HTTP client that records latency per endpoint name"""
+
+    def __init__(self, base_url, results):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        self.results = results
+        self.token = None
+
+    def request(self, name, method, path, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            data, status = b'', 0
+        elapsed = time.perf_counter() - started
+
+        latencies, errors = self.results.setdefault(name, ([], [0]))
+        latencies.append(elapsed)
+        if status == 0 or status >= 400:
+            errors[0] += 1
+        return status, data
+
+class Workloads:
+    def __init__(self, args):
+        self.args = args
+
+    def _store(self, rng):
+        return seed_id('store', rng.randrange(self.args.stores))
+
+    def _customer(self, rng):
+        return seed_email(self.args.stores + rng.randrange(self.args.customers))
+
+    def browse(self, client, rng):
+        client.request('GET /api/stores/', 'GET', f'/api/stores/?page={rng.randint(1, 50)}&limit=20')
+        store_id = self._store(rng)
+        client.request('GET /api/stores/<id>', 'GET', f'/api/stores/{store_id}')
+        client.request('GET /api/products?store_id', 'GET', f'/api/products?store_id={store_id}')
+
+    def search(self, client, rng):
+        client.request('GET /api/products?search', 'GET',
+                       f'/api/products?search={quote(rng.choice(WORDS))}')
+
+    def login(self, client, rng):
+        status, data = client.request('POST /api/auth/login', 'POST', '/api/auth/login', {
+            'email': self._customer(rng),
+            'password': PASSWORD
+        })
+        if status == 200:
+            client.token = json.loads(data)['token']
+
+    def cart(self, client, rng):
+        if not client.token:
+            self.login(client, rng)
+        product_id = seed_id('product', rng.randrange(self.args.products))
+        client.request('POST /api/cart/items', 'POST', '/api/cart/items',
+                       {'product_id': product_id, 'quantity': rng.randint(1, 3)})
+        client.request('GET /api/cart/', 'GET', '/api/cart/')
+
+def run_clients(args, base_url):
+    mix = dict(item.split('=') for item in args.mix.split(','))
+    names = list(mix)
+    weights = [float(mix[name]) for name in names]
+    workloads = Workloads(args)
+    deadline = time.perf_counter() + args.warmup + args.duration
+    measure_from = time.perf_counter() + args.warmup
+    per_client = []
+
+    def client_loop(index):
+        rng = random.Random(args.seed * 1000 + index)
+        warm, results = {}, {}
+        client = Client(base_url, warm)
+        while time.perf_counter() < deadline:
+            if client.results is warm and time.perf_counter() >= measure_from:
+                client.results = results
+            getattr(workloads, rng.choices(names, weights)[0])(client, rng)
+        per_client.append(results)
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = {}
+    for results in per_client:
+        for name, (latencies, errors) in results.items():
+            entry = merged.setdefault(name, ([], [0]))
+            entry[0].extend(latencies)
+            entry[1][0] += errors[0]
+    return merged
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def summarise(merged, duration):
+    endpoints = {}
+    for name, (latencies, errors) in sorted(merged.items()):
+        latencies.sort()
+        endpoints[name] = {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'rps': round(len(latencies) / duration, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2)
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return endpoints, {'requests': total, 'rps': round(total / duration, 2)}
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_server(args):
+    bind = f'127.0.0.1:{args.port}'
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(args.workers),
+        '--threads', str(args.threads), '--bind', bind, '--log-level', 'warning',
+        'wsgi:app'
+    ], cwd=BACKEND_DIR)
+
+    base_url = f'http://{bind}'
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return server, base_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('server did not become healthy')
+
+def print_report(report, baseline=None):
+    base = (baseline or {}).get('endpoints', {})
+    print(f"{'endpoint':<32}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    for name, e in report['endpoints'].items():
+        line = f"{name:<32}{e['rps']:>9.1f}{e['p50_ms']:>9.1f}{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['errors']:>8}"
+        if name in base and base[name]['p99_ms']:
+            delta = (e['p99_ms'] - base[name]['p99_ms']) / base[name]['p99_ms'] * 100
+            line += f"   p99 {delta:+.1f}%"
+        print(line)
+    print(f"total: {report['total']['requests']} requests, {report['total']['rps']} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('--url', help='benchmark a running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--mix', default='browse=60,search=20,login=10,cart=10')
+    parser.add_argument('--stores', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--customers', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(args)
+
+    try:
+        merged = run_clients(args, base_url)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    endpoints, total = summarise(merged, args.duration)
+    report = {
+        'revision': git_revision(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'endpoints': endpoints,
+        'total': total
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Cold-start benchmark: time from a fresh interpreter to the first response.
+
+Each run starts a new Python process that imports the app, calls
+create_app() and serves GET /health through the test client, reporting
+the three phases. With --gunicorn it instead starts the production server
+(gunicorn.conf.py) and measures until /health answers over HTTP.
+
+Exits with status 1 when the median time-to-first-request exceeds
+--target-ms, so it can gate CI.
+
+    python -m benchmarks.cold_start --runs 10 --target-ms 500
+    python -m benchmarks.cold_start --gunicorn --workers 4 --target-ms 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get('/health').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000
+}))
+"""
+
+def probe_in_process(env):
+    """Phases of one cold start, plus interpreter startup"""
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env, text=True)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+def probe_gunicorn(env, port, workers):
+    """Time from spawning gunicorn until /health answers"""
+    started = time.perf_counter()
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), 'wsgi:app'
+    ], cwd=BACKEND_DIR, env=env, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < 30:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                conn.request('GET', '/health')
+                status = conn.getresponse().status
+                return {'status': status, 'process_ms': (time.perf_counter() - started) * 1000}
+            except OSError:
+                time.sleep(0.005)
+        raise SystemExit('gunicorn did not answer within 30s')
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=500)
+    parser.add_argument('--gunicorn', action='store_true')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # create_app() only needs the keys to exist
+    env.setdefault('SECRET_KEY', 'cold-start')
+    env.setdefault('JWT_SECRET_KEY', 'cold-start')
+
+    results = []
+    for _ in range(args.runs):
+        if args.gunicorn:
+            results.append(probe_gunicorn(env, args.port, args.workers))
+        else:
+            results.append(probe_in_process(env))
+
+    for key in results[0]:
+        if key == 'status':
+            continue
+        values = [r[key] for r in results]
+        print(f"{key:<18} median {statistics.median(values):8.1f} ms   "
+              f"min {min(values):8.1f}   max {max(values):8.1f}")
+
+    median = statistics.median(r['process_ms'] for r in results)
+    verdict = 'OK' if median <= args.target_ms else 'OVER TARGET'
+    print(f"time to first request: {median:.1f} ms (target {args.target_ms:.0f} ms) {verdict}")
+    if median > args.target_ms or any(r['status'] != 200 for r in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark of the JSON providers on catalog pages.
+
+Loads pages of products with the same query shape as GET /api/products
+(RealDictCursor rows with Decimal and datetime columns) and times how long
+each provider takes to turn a page into a response body. With --synthetic
+no database is needed and rows of the same shape are generated instead.
+
+    python -m benchmarks.json_serializers --page-size 500
+    python -m benchmarks.json_serializers --synthetic --page-size 2000
+"""
+import argparse
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import FastJSONProvider, orjson
+
+def load_page(page_size):
+    from database.db import connect
+    db = connect()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("""
+                SELECT p.*, s.name as store_name, s.city as store_city,
+                       pi.image_url, c.name as category_name
+                FROM products p
+                JOIN stores s ON p.store_id = s.store_id
+                LEFT JOIN categories c ON p.category_id = c.category_id
+                LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = TRUE
+                WHERE p.is_active = TRUE AND s.is_active = TRUE
+                ORDER BY p.date_created DESC
+                LIMIT %s
+            """, (page_size,))
+            return cursor.fetchall()
+    finally:
+        db.close()
+
+def synthetic_page(page_size):
+    now = datetime(2024, 1, 1)
+    return [{
+        'product_id': str(uuid.uuid4()),
+        'store_id': str(uuid.uuid4()),
+        'category_id': f'cat{i % 11 + 1}',
+        'name': f'Chocolate fudge cake #{i}',
+        'description': 'Rich layered chocolate sponge with ganache. ' * 4,
+        'price': Decimal('24.99') + i,
+        'sale_price': Decimal('19.99') + i if i % 3 == 0 else None,
+        'stock_quantity': i % 40,
+        'is_featured': i % 7 == 0,
+        'is_active': True,
+        'date_created': now - timedelta(minutes=i),
+        'date_updated': now,
+        'avg_rating': Decimal('4.25'),
+        'loyalty_points_earned': 10,
+        'store_name': 'Sweet Indulgence Bakery',
+        'store_city': 'Lahore',
+        'image_url': f'/uploads/products/{uuid.uuid4()}.jpg',
+        'category_name': 'Cakes'
+    } for i in range(page_size)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--synthetic', action='store_true')
+    args = parser.parse_args()
+
+    rows = synthetic_page(args.page_size) if args.synthetic else load_page(args.page_size)
+    payload = {'success': True, 'products': rows}
+
+    app = Flask(__name__)
+    providers = [('stdlib json', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', FastJSONProvider(app)))
+    else:
+        print('orjson is not installed, only the stdlib provider is measured')
+
+    print(f"{len(rows)} rows per page, {args.repeat} repetitions")
+    baseline = None
+    with app.app_context():
+        for name, provider in providers:
+            body = provider.response(payload).get_data()
+            seconds = min(timeit.repeat(lambda: provider.response(payload), number=args.repeat, repeat=3))
+            per_page = seconds / args.repeat * 1000
+            baseline = baseline or per_page
+            print(f"{name:12} {per_page:8.3f} ms/page  {len(body) / 1024:8.1f} KiB  "
+                  f"{baseline / per_page:5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Concurrency benchmark for loyalty point redemption on one hot account.
+
+Creates a throwaway user with a known balance and lets several threads,
+each with its own connection, redeem from it as fast as they can until the
+balance runs out. Afterwards it checks that exactly the starting balance
+was redeemed (no overspend), that users.loyalty_points, the balance
+snapshot and the ledger agree, and reports redemptions per second.
+
+Every redemption evicts the user from the cache, which in 'notify' mode is
+a pg_notify behind the invalidation bus lock, so by default the benchmark
+runs with cache invalidation off to measure the redemption itself. Pass
+--invalidation notify to include the broadcast. Run against a scratch
+database only:
+
+    python -m benchmarks.loyalty_redemption --threads 16 --balance 20000 --yes
+"""
+import argparse
+import threading
+import time
+
+from database.db import connect
+from models.loyalty import LoyaltyPoints
+from utils.auth import generate_uuid
+from utils import invalidation
+
+def create_account(db, balance):
+    user_id = generate_uuid()
+    with db.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO users (user_id, email, password_hash, first_name, last_name)
+            VALUES (%s, %s, 'x', 'Bench', 'Redeemer')
+        """, (user_id, f"{user_id}@bench.invalid"))
+    db.commit()
+    LoyaltyPoints.record(user_id, balance, 'earned', 'Benchmark balance', db=db)
+    return user_id
+
+def worker(user_id, points, results, index, start):
+    db = None
+    successes = attempts = 0
+    error = None
+    try:
+        db = connect()
+        start.wait()
+        while True:
+            attempts += 1
+            if LoyaltyPoints.redeem(user_id, points, db=db) is None:
+                break
+            successes += 1
+    except Exception as e:
+        error = e
+    finally:
+        if db is not None:
+            db.close()
+        # Always filled in, so a failed thread is reported rather than
+        # breaking the totals
+        results[index] = (successes, attempts, error)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--balance', type=int, default=20000)
+    parser.add_argument('--points', type=int, default=1, help='points per redemption')
+    parser.add_argument('--invalidation', choices=('off', 'notify'), default='off',
+                        help='cache invalidation mode while redeeming (default: off)')
+    parser.add_argument('--yes', action='store_true',
+                        help='confirm the configured database is a scratch database')
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error('this benchmark writes to the configured database, pass --yes to confirm')
+
+    # Read by the bus on every publish, so this covers the whole run
+    invalidation.CACHE_INVALIDATION = args.invalidation
+
+    db = connect()
+    user_id = create_account(db, args.balance)
+
+    results = [None] * args.threads
+    start = threading.Event()
+    threads = [
+        threading.Thread(target=worker, args=(user_id, args.points, results, i, start))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    successes = sum(r[0] for r in results)
+    attempts = sum(r[1] for r in results)
+    redeemed = successes * args.points
+    failed = [(i, r[2]) for i, r in enumerate(results) if r[2] is not None]
+
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT u.loyalty_points, b.balance,
+                   (SELECT SUM(points) FROM loyalty_points_transactions t
+                    WHERE t.user_id = u.user_id) AS ledger
+            FROM users u JOIN loyalty_balances b ON b.user_id = u.user_id
+            WHERE u.user_id = %s
+        """, (user_id,))
+        final = cursor.fetchone()
+        cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+    db.commit()
+    db.close()
+
+    expected_remaining = args.balance - redeemed
+    consistent = final['loyalty_points'] == final['balance'] == final['ledger'] == expected_remaining
+    overspent = redeemed > args.balance
+
+    print(f"Threads:            {args.threads}")
+    print(f"Cache invalidation: {args.invalidation}")
+    print(f"Redemptions:        {successes} ok / {attempts} attempts")
+    print(f"Points redeemed:    {redeemed} of {args.balance}")
+    print(f"Final balance:      users={final['loyalty_points']} snapshot={final['balance']} "
+          f"ledger={final['ledger']}")
+    print(f"Overspend:          {'YES' if overspent else 'none'}")
+    print(f"Consistent:         {'yes' if consistent else 'NO'}")
+    print(f"Throughput:         {successes / elapsed:,.0f} redemptions/s over {elapsed:.2f}s")
+    print(f"Failed threads:     {len(failed) or 'none'}")
+    for index, error in failed:
+        print(f"  thread {index}: {type(error).__name__}: {error}")
+
+    if overspent or not consistent or failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Throughput benchmark for the price-drop notification pipeline.
+
+Seeds synthetic users, products and wishlist rows with set-based SQL,
+lowers the price of a share of the products (so the trigger logs the
+drops) and times PriceDrop.process_pending. Seeded rows share the
+'bpd-' id prefix and are removed afterwards. Run against a scratch
+database only:
+
+    python -m benchmarks.price_drops --wishlist-rows 1000000 --yes
+"""
+import argparse
+import time
+
+from database.db import connect
+from models.price_drop import PriceDrop
+
+PREFIX = 'bpd-'
+
+def seed(db, users, products, items_per_user):
+    with db.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO users (user_id, email, password_hash, first_name, last_name)
+            SELECT %(p)s || 'u' || i, %(p)s || i || '@bench.invalid', 'x', 'Bench', 'User'
+            FROM generate_series(1, %(users)s) AS i
+        """, {'p': PREFIX, 'users': users})
+        cursor.execute("""
+            INSERT INTO stores (store_id, owner_id, name, address, city, phone)
+            VALUES (%(p)s || 's', %(p)s || 'u1', 'Bench Store', 'Bench Road', 'Bench', '0')
+        """, {'p': PREFIX})
+        cursor.execute("""
+            INSERT INTO products (product_id, store_id, category_id, name, price)
+            SELECT %(p)s || 'p' || i, %(p)s || 's', 'cat1', 'Bench product ' || i, 100
+            FROM generate_series(1, %(products)s) AS i
+        """, {'p': PREFIX, 'products': products})
+        cursor.execute("""
+            INSERT INTO wishlist (wishlist_id, user_id)
+            SELECT %(p)s || 'w' || i, %(p)s || 'u' || i
+            FROM generate_series(1, %(users)s) AS i
+        """, {'p': PREFIX, 'users': users})
+        # Spread each user's items over the catalogue with a multiplicative hash
+        cursor.execute("""
+            INSERT INTO wishlist_items (wishlist_item_id, wishlist_id, product_id)
+            SELECT %(p)s || 'wi' || u || '-' || j, %(p)s || 'w' || u,
+                   %(p)s || 'p' || (1 + (u * 7919 + j * 104729) %% %(products)s)
+            FROM generate_series(1, %(users)s) AS u,
+                 generate_series(1, %(per_user)s) AS j
+            ON CONFLICT DO NOTHING
+        """, {'p': PREFIX, 'users': users, 'products': products, 'per_user': items_per_user})
+        cursor.execute("ANALYZE wishlist_items")
+    db.commit()
+
+def cleanup(db):
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE user_id LIKE %s", (PREFIX + '%',))
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wishlist-rows', type=int, default=1000000)
+    parser.add_argument('--items-per-user', type=int, default=20)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--drop-share', type=float, default=0.1,
+                        help='fraction of products whose price is lowered')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--yes', action='store_true',
+                        help='confirm the configured database is a scratch database')
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error('this benchmark writes to the configured database, pass --yes to confirm')
+
+    users = max(args.wishlist_rows // args.items_per_user, 1)
+    db = connect()
+    try:
+        cleanup(db)
+        started = time.perf_counter()
+        seed(db, users, args.products, args.items_per_user)
+        print(f"Seeded {users} users x {args.items_per_user} wishlist items "
+              f"over {args.products} products in {time.perf_counter() - started:.1f}s")
+
+        with db.cursor() as cursor:
+            cursor.execute("""
+                UPDATE products SET price = price * 0.9
+                WHERE product_id LIKE %s AND random() < %s
+            """, (PREFIX + '%', args.drop_share))
+            dropped = cursor.rowcount
+        db.commit()
+
+        started = time.perf_counter()
+        changes, notifications = PriceDrop.process_pending(db, args.batch_size)
+        elapsed = time.perf_counter() - started
+
+        print(f"Price drops logged:      {dropped}")
+        print(f"Changes processed:       {changes}")
+        print(f"Notifications enqueued:  {notifications}")
+        print(f"Elapsed:                 {elapsed:.2f}s")
+        if elapsed:
+            print(f"Throughput:              {notifications / elapsed:,.0f} notifications/s, "
+                  f"{users * args.items_per_user / elapsed:,.0f} wishlist rows/s")
+    finally:
+        cleanup(db)
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,133 @@
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
-from flask import g
+from flask import g, has_app_context, current_app, request
+from collections import Counter
+import threading
+import time
 import os
 from dotenv import load_dotenv
+from utils.metrics import metrics
 
 load_dotenv()
 
+# Warn when a request issues more statements than this, or repeats the same
+# statement this many times (a likely N+1 loop)
+QUERY_COUNT_WARN = int(os.getenv('QUERY_COUNT_WARN', 20))
+N_PLUS_ONE_WARN = int(os.getenv('N_PLUS_ONE_WARN', 5))
+
+class QueryStats:
+    """Per-request record of the SQL issued through instrumented cursors"""
+    __slots__ = ('count', 'total', 'slowest', 'slowest_sql', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.statements = Counter()
+
+    def record(self, sql, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.statements[sql] += 1
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_sql = sql
+
+def _record_query(query, elapsed):
+    if not has_app_context():
+        return
+    stats = g.get('query_stats')
+    if stats is None:
+        stats = g.query_stats = QueryStats()
+    if not isinstance(query, str):
+        query = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    stats.record(' '.join(query.split()), elapsed)
+
+class _InstrumentedMixin:
+    """Times every statement and records it against the current request"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record_query(query, time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            _record_query(sql, time.perf_counter() - started)
+
+class InstrumentedCursor(_InstrumentedMixin, psycopg2.extensions.cursor):
+    pass
+
+class InstrumentedRealDictCursor(_InstrumentedMixin, psycopg2.extras.RealDictCursor):
+    pass
+
+class SharedConnection:
+    """A connection lent to one borrower at a time (batch sub-requests)
+
+    A borrower holds the connection from its first get_db() until its
+    context ends. Whatever transaction it leaves open is then rolled back,
+    so a failed statement or a commit in one sub-request cannot affect the
+    others.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+
+    def borrow(self):
+        self._lock.acquire()
+        return self.db
+
+    def give_back(self):
+        try:
+            if self.db.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self.db.rollback()
+        finally:
+            self._lock.release()
+
+def connect():
+    """Open a new database connection (outside of the request context)"""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=int(os.getenv('DB_PORT', 5433)),  # Convert to int and use 5433
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        dbname=os.getenv('DB_NAME'),
+        # Use a reasonable timeout (in seconds)
+        connect_timeout=5,
+        # Models index rows by column name, so plain db.cursor() must
+        # return dictionaries too
+        cursor_factory=InstrumentedRealDictCursor
+    )
+
 def get_db():
     """Get the database connection"""
     if 'db' not in g:
-        g.db = psycopg2.connect(
-            host=os.getenv('DB_HOST'),
-            port=int(os.getenv('DB_PORT', 5433)),  # Convert to int and use 5433
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            dbname=os.getenv('DB_NAME'),
-            # Use a reasonable timeout (in seconds)
-            connect_timeout=5
-        )
+        shared = g.get('db_shared')
+        if shared is not None:
+            g.db = shared.borrow()
+            return g.db
+        g.db = connect()
+        metrics.inc('db_connections_in_use')
         # Enable autocommit for better transaction control
         g.db.autocommit = False
         
         # Set cursor factory to return dictionaries instead of tuples
-        g.cursor_factory = psycopg2.extras.RealDictCursor
+        g.cursor_factory = InstrumentedRealDictCursor
         
     return g.db
 
@@ -30,17 +135,55 @@ def get_cursor():
     """Get a database cursor that returns dictionaries"""
     db = get_db()
     # Always use RealDictCursor to ensure dictionary-like access
-    return db.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    return db.cursor(cursor_factory=InstrumentedRealDictCursor)
 
 def close_db(e=None):
     """Close the database connection"""
     db = g.pop('db', None)
-    if db is not None:
+    # Batch sub-requests borrow the batch request's connection
+    shared = g.pop('db_shared', None)
+    if db is None:
+        return
+    if shared is not None:
+        shared.give_back()
+    else:
         db.close()
+        metrics.inc('db_connections_in_use', amount=-1)
+
+def add_query_timing(response):
+    """Report the request's SQL usage in a Server-Timing header"""
+    stats = g.get('query_stats')
+    if stats is None:
+        return response
+    
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={stats.total * 1000:.1f};desc="{stats.count} queries"'
+    )
+    response.headers.add('Server-Timing', f'db-slowest;dur={stats.slowest * 1000:.1f}')
+    
+    if stats.count > QUERY_COUNT_WARN:
+        current_app.logger.warning(
+            "%s issued %d queries (%.1f ms), slowest %.1f ms: %s",
+            request_label(), stats.count, stats.total * 1000,
+            stats.slowest * 1000, stats.slowest_sql
+        )
+    sql, repeats = stats.statements.most_common(1)[0]
+    if repeats >= N_PLUS_ONE_WARN:
+        current_app.logger.warning(
+            "Possible N+1 in %s: statement ran %d times: %s",
+            request_label(), repeats, sql
+        )
+    return response
+
+def request_label():
+    """Describe the current request by method and route pattern"""
+    return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
 
 def init_app(app):
     """Initialize database connection"""
     app.teardown_appcontext(close_db)
+    app.after_request(add_query_timing)
 
 # Examples of how to use these functions (comment these out or remove them in production)
 """
@@ -110,6 +110,7 @@ CREATE TABLE cart (
     cart_id VARCHAR(36) PRIMARY KEY,
     user_id VARCHAR(36) NOT NULL,
     date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 0, -- Bumped on every write-back, see models.cart
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
@@ -199,4 +200,90 @@ INSERT INTO categories (category_id, name, description) VALUES
 ('cat8', 'Donuts', 'Fried and baked donuts'),
 ('cat9', 'Breads', 'Sweet and savory breads'),
 ('cat10', 'Custom Orders', 'Custom made products'),
-('cat11', 'Seasonal Specials', 'Seasonal and holiday items');
\ No newline at end of file
+('cat11', 'Seasonal Specials', 'Seasonal and holiday items');
+
+-- Admin user listing: keyset pagination on (date_joined, user_id) with optional filters
+CREATE INDEX idx_users_date_joined ON users (date_joined DESC, user_id DESC);
+CREATE INDEX idx_users_role_joined ON users (role, date_joined DESC, user_id DESC);
+CREATE INDEX idx_users_city_joined ON users (city, date_joined DESC, user_id DESC);
+CREATE INDEX idx_users_active_joined ON users (date_joined DESC, user_id DESC) WHERE is_active = TRUE;
+
+-- One cart per user, one line per product (the cart store upserts on these)
+CREATE UNIQUE INDEX idx_cart_user ON cart (user_id);
+CREATE UNIQUE INDEX idx_cart_items_cart_product ON cart_items (cart_id, product_id);
+
+-- One wishlist per user, each product at most once per wishlist
+CREATE UNIQUE INDEX idx_wishlist_user ON wishlist (user_id);
+CREATE UNIQUE INDEX idx_wishlist_items_wishlist_product ON wishlist_items (wishlist_id, product_id);
+
+-- Price-drop pipeline: product price changes are captured by a trigger into a
+-- change log, and a batch job joins the log against wishlists to enqueue
+-- deduplicated notifications
+CREATE INDEX idx_wishlist_items_product ON wishlist_items (product_id);
+
+CREATE TABLE product_price_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    product_id VARCHAR(36) NOT NULL,
+    old_price DECIMAL(10,2) NOT NULL, -- effective price (sale price if lower)
+    new_price DECIMAL(10,2) NOT NULL,
+    date_changed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed BOOLEAN DEFAULT FALSE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_price_changes_pending ON product_price_changes (change_id) WHERE processed = FALSE;
+
+CREATE TABLE price_drop_notifications (
+    notification_id BIGSERIAL PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    product_id VARCHAR(36) NOT NULL,
+    old_price DECIMAL(10,2) NOT NULL,
+    new_price DECIMAL(10,2) NOT NULL,
+    date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_sent TIMESTAMP,
+    UNIQUE (user_id, product_id, new_price),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_price_drop_notifications_unsent ON price_drop_notifications (notification_id) WHERE date_sent IS NULL;
+
+CREATE FUNCTION log_product_price_change() RETURNS TRIGGER AS $$
+BEGIN
+    -- LEAST ignores NULLs, so this is the sale price when set, else the price
+    IF LEAST(NEW.price, NEW.sale_price) < LEAST(OLD.price, OLD.sale_price) THEN
+        INSERT INTO product_price_changes (product_id, old_price, new_price)
+        VALUES (NEW.product_id, LEAST(OLD.price, OLD.sale_price), LEAST(NEW.price, NEW.sale_price));
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_products_price_change
+AFTER UPDATE OF price, sale_price ON products
+FOR EACH ROW EXECUTE FUNCTION log_product_price_change();
+
+-- Loyalty ledger: per-user running balances maintained alongside every
+-- ledger insert, so summaries are a single-row read. Ledger points are
+-- signed (earned > 0, redeemed/expired < 0) and each column is the sum of
+-- that transaction_type. Points pending on undelivered orders are summed
+-- from orders when read, since order status changes do not touch the ledger.
+CREATE INDEX idx_loyalty_transactions_user_date ON loyalty_points_transactions (user_id, date_created DESC, transaction_id DESC);
+
+CREATE TABLE loyalty_balances (
+    user_id VARCHAR(36) PRIMARY KEY,
+    earned INTEGER NOT NULL DEFAULT 0,
+    redeemed INTEGER NOT NULL DEFAULT 0,
+    expired INTEGER NOT NULL DEFAULT 0,
+    adjustment INTEGER NOT NULL DEFAULT 0,
+    balance INTEGER NOT NULL DEFAULT 0,
+    date_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+CREATE INDEX idx_orders_user_status ON orders (user_id, status);
+
+-- Supplier dashboard summary: every section starts from the owner's stores
+CREATE INDEX idx_stores_owner ON stores (owner_id);
+CREATE INDEX idx_products_store_stock ON products (store_id, stock_quantity);
+CREATE INDEX idx_orders_store_status_date ON orders (store_id, status, date_created);
+CREATE INDEX idx_reviews_product_date ON reviews (product_id, date_created DESC);
@@ -0,0 +1,68 @@
+"""Production server settings.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (GUNICORN_WORKERS,
+GUNICORN_THREADS, ...) or on the command line.
+"""
+import multiprocessing
+import tempfile
+import glob
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Pre-fork workers, each serving requests from a small thread pool. Most
+# request time is spent waiting on Postgres or in bcrypt (which releases
+# the GIL), so a few threads per worker keep the CPUs busy.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Import and build the app once in the master; workers fork with every
+# module already loaded and share those pages copy-on-write, so a new or
+# recycled worker serves its first request without paying import time.
+# Background threads (cart write-back, metrics dump, profiler) are started
+# lazily, so none of them exist in the master at fork time.
+preload_app = True
+
+# Recycle workers periodically to bound memory growth; jitter keeps them
+# from restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Workers write their metrics here so /metrics can report all of them,
+# whichever worker serves the scrape (read by utils.metrics at import)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'app-metrics-{os.getpid()}'))
+# Likewise for the profiler's state and samples (read by utils.profiler)
+os.environ.setdefault('PROFILER_DIR', os.path.join(tempfile.gettempdir(), f'app-profiler-{os.getpid()}'))
+
+def on_starting(server):
+    # Start every server's counters and profiles from zero
+    for name in ('METRICS_DIR', 'PROFILER_DIR'):
+        shared_dir = os.environ[name]
+        os.makedirs(shared_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(shared_dir, '*.json')):
+            os.remove(path)
+
+def worker_exit(server, worker):
+    # Write buffered carts back before the worker goes away (recycling,
+    # scale-down or deploys), rather than relying on atexit alone
+    from utils.metrics import metrics
+    metrics.dump()
+    from models.cart import cart_store
+    cart_store.flush_all()
+
+def child_exit(server, worker):
+    # Runs in the master: keep the exited worker's counters, drop its gauges
+    from utils.metrics import metrics
+    metrics.mark_process_dead(worker.pid)
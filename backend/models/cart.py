@@ -0,0 +1,421 @@
+from database.db import get_db, connect
+from utils.auth import generate_uuid
+from utils.invalidation import bus
+from datetime import datetime
+import psycopg2.extras
+import threading
+import logging
+import atexit
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# How often dirty carts are written back, and how many per transaction
+CART_FLUSH_INTERVAL = float(os.getenv('CART_FLUSH_INTERVAL', 2))
+CART_FLUSH_BATCH = int(os.getenv('CART_FLUSH_BATCH', 500))
+# Clean carts untouched for this many seconds are dropped from memory
+CART_IDLE_TTL = int(os.getenv('CART_IDLE_TTL', 1800))
+# Clean carts are re-read from the database after this many seconds, in
+# case another worker changed them and its invalidation was missed
+CART_CLEAN_TTL = float(os.getenv('CART_CLEAN_TTL', 30))
+
+class Cart:
+    @staticmethod
+    def load(user_id, db=None):
+        """Load a user's cart from the database, returns (cart_id, version, items by product_id)"""
+        db = db or get_db()
+        with db.cursor() as cursor:
+            sql = """
+                SELECT c.cart_id, c.version, ci.cart_item_id, ci.product_id, ci.quantity, ci.date_added
+                FROM cart c
+                LEFT JOIN cart_items ci ON ci.cart_id = c.cart_id
+                WHERE c.user_id = %s
+                ORDER BY ci.date_added
+            """
+            cursor.execute(sql, (user_id,))
+            rows = cursor.fetchall()
+
+        if not rows:
+            return None, 0, {}
+
+        items = {}
+        for row in rows:
+            if row['cart_item_id']:
+                items[row['product_id']] = {
+                    'cart_item_id': row['cart_item_id'],
+                    'product_id': row['product_id'],
+                    'quantity': row['quantity'],
+                    'date_added': row['date_added']
+                }
+        return rows[0]['cart_id'], rows[0]['version'], items
+
+    @staticmethod
+    def product_is_available(product_id, db=None):
+        """Check that a product exists and can be added to a cart"""
+        db = db or get_db()
+        with db.cursor() as cursor:
+            sql = "SELECT 1 FROM products WHERE product_id = %s AND is_active = TRUE"
+            cursor.execute(sql, (product_id,))
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def available_products(product_ids, db=None):
+        """Return the subset of product_ids that can be added to a cart"""
+        if not product_ids:
+            return set()
+        db = db or get_db()
+        with db.cursor() as cursor:
+            sql = "SELECT product_id FROM products WHERE product_id = ANY(%s) AND is_active = TRUE"
+            cursor.execute(sql, (list(product_ids),))
+            return {row['product_id'] for row in cursor.fetchall()}
+
+    @staticmethod
+    def save_many(carts, db):
+        """Write back a batch of carts in a single transaction
+
+        `carts` is a list of (user_id, cart_id, version, items), where
+        version is the one the items were loaded at. A cart is only written
+        if its stored version still matches (or, for a new cart, if no cart
+        exists for the user yet); its items then replace whatever is stored
+        and the version is bumped. Returns ({user_id: (cart_id, version)}
+        as stored, set of user_ids whose cart was changed by someone else).
+        """
+        new = [(generate_uuid(), user_id, 1) for user_id, cart_id, _, _ in carts if cart_id is None]
+        existing = [(cart_id, version) for _, cart_id, version, _ in carts if cart_id is not None]
+
+        with db.cursor() as cursor:
+            stored = []
+            if new:
+                stored += psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO cart (cart_id, user_id, version) VALUES %s
+                    ON CONFLICT (user_id) DO NOTHING
+                    RETURNING user_id, cart_id, version
+                """, new, fetch=True)
+            if existing:
+                stored += psycopg2.extras.execute_values(cursor, """
+                    UPDATE cart c SET version = c.version + 1
+                    FROM (VALUES %s) AS v (cart_id, version)
+                    WHERE c.cart_id = v.cart_id AND c.version = v.version
+                    RETURNING c.user_id, c.cart_id, c.version
+                """, existing, fetch=True)
+            written = {row['user_id']: (row['cart_id'], row['version']) for row in stored}
+            conflicts = {user_id for user_id, _, _, _ in carts if user_id not in written}
+
+            if written:
+                cursor.execute(
+                    "DELETE FROM cart_items WHERE cart_id = ANY(%s)",
+                    ([cart_id for cart_id, _ in written.values()],)
+                )
+
+            rows = [
+                (item['cart_item_id'], written[user_id][0], item['product_id'],
+                 item['quantity'], item['date_added'])
+                for user_id, _, _, items in carts if user_id in written
+                for item in items
+            ]
+            if rows:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO cart_items (
+                        cart_item_id, cart_id, product_id, quantity, date_added
+                    ) VALUES %s
+                """, rows)
+        db.commit()
+
+        return written, conflicts
+
+class CartStore:
+    """In-process hot tier for carts with coalesced write-back
+
+    Reads and mutations are served from memory. Mutated carts are marked
+    dirty; the cart routes write them back with flush() before answering,
+    and a background thread writes whatever is still dirty (failed or
+    unconfirmed writes) to cart/cart_items in batches every
+    CART_FLUSH_INTERVAL seconds. A cart that is not in memory (cold start, eviction) is
+    loaded from the database on first access.
+
+    Every gunicorn worker has its own store, so writes are checked against
+    the cart's version: a cart changed by another worker since it was
+    loaded is not overwritten; the local changes are dropped and the cart
+    is reloaded. Successful writes are broadcast on the invalidation bus so
+    other workers reload their clean copies, and clean carts are re-read
+    after CART_CLEAN_TTL in any case. A cart whose write fails stays dirty
+    and is retried on the next flush.
+    """
+
+    def __init__(self, flush_interval=CART_FLUSH_INTERVAL, batch_size=CART_FLUSH_BATCH,
+                 idle_ttl=CART_IDLE_TTL, clean_ttl=CART_CLEAN_TTL):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.idle_ttl = idle_ttl
+        self.clean_ttl = clean_ttl
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._carts = {}
+        self._dirty = set()
+        # Carts taken for writing whose write has not finished yet
+        self._writing = set()
+        self._flusher = None
+        self._conn = None
+        bus.subscribe('carts', self._expire)
+
+    def _state(self, user_id):
+        """Get the in-memory state of a cart, loading it from the database on a miss"""
+        now = time.monotonic()
+        state = self._carts.get(user_id)
+        if state is None or (now - state['synced'] > self.clean_ttl and not self._pending(user_id)):
+            cart_id, version, items = Cart.load(user_id)
+            loaded = {'cart_id': cart_id, 'version': version, 'items': items, 'synced': now}
+            with self._lock:
+                state = self._carts.setdefault(user_id, loaded)
+                # Refresh a stale copy in place, so a mutation racing with the
+                # reload is not applied to a discarded dict, unless it has been
+                # changed or written since we read it
+                if state is not loaded and state['synced'] < now and not self._pending(user_id):
+                    state.update(loaded)
+        state['touched'] = now
+        return state
+
+    def _pending(self, user_id):
+        return user_id in self._dirty or user_id in self._writing
+
+    def _expire(self, user_id):
+        # Another worker wrote this cart (None: possibly any cart); reload
+        # clean copies on next access
+        with self._lock:
+            user_ids = list(self._carts) if user_id is None else [user_id]
+            for user_id in user_ids:
+                state = self._carts.get(user_id)
+                if state is not None and not self._pending(user_id):
+                    state['synced'] = float('-inf')
+
+    def _mark_dirty(self, user_id):
+        self._dirty.add(user_id)
+        if self._flusher is None:
+            self._start_flusher()
+
+    def get_items(self, user_id):
+        """Get a copy of the items in a user's cart"""
+        state = self._state(user_id)
+        with self._lock:
+            return [dict(item) for item in state['items'].values()]
+
+    def add_item(self, user_id, product_id, quantity=1):
+        """Add a product to the cart, bumping the quantity if it is already there"""
+        state = self._state(user_id)
+        with self._lock:
+            item = state['items'].get(product_id)
+            if item:
+                item['quantity'] += quantity
+            else:
+                item = {
+                    'cart_item_id': generate_uuid(),
+                    'product_id': product_id,
+                    'quantity': quantity,
+                    'date_added': datetime.utcnow()
+                }
+                state['items'][product_id] = item
+            self._mark_dirty(user_id)
+            return dict(item)
+
+    def update_item(self, user_id, cart_item_id, quantity):
+        """Set the quantity of a cart item (0 removes it), returns False if not found"""
+        state = self._state(user_id)
+        with self._lock:
+            for product_id, item in state['items'].items():
+                if item['cart_item_id'] == cart_item_id:
+                    if quantity > 0:
+                        item['quantity'] = quantity
+                    else:
+                        del state['items'][product_id]
+                    self._mark_dirty(user_id)
+                    return True
+            return False
+
+    def remove_item(self, user_id, cart_item_id):
+        """Remove an item from the cart, returns False if not found"""
+        return self.update_item(user_id, cart_item_id, 0)
+
+    def clear(self, user_id):
+        """Remove every item from the cart"""
+        state = self._state(user_id)
+        with self._lock:
+            state['items'] = {}
+            self._mark_dirty(user_id)
+
+    def apply(self, user_id, operations):
+        """Apply a validated list of operations to a cart in one step
+
+        Operations are dicts with an 'op' of add (product_id, quantity),
+        update (cart_item_id, quantity), remove (cart_item_id) or clear.
+        Returns the number of operations that matched an item.
+        """
+        state = self._state(user_id)
+        applied = 0
+        with self._lock:
+            items = state['items']
+            by_item_id = {item['cart_item_id']: product_id for product_id, item in items.items()}
+            for operation in operations:
+                op = operation['op']
+                if op == 'add':
+                    item = items.get(operation['product_id'])
+                    if item:
+                        item['quantity'] += operation['quantity']
+                    else:
+                        item = {
+                            'cart_item_id': generate_uuid(),
+                            'product_id': operation['product_id'],
+                            'quantity': operation['quantity'],
+                            'date_added': datetime.utcnow()
+                        }
+                        items[operation['product_id']] = item
+                        by_item_id[item['cart_item_id']] = operation['product_id']
+                    applied += 1
+                elif op == 'clear':
+                    items.clear()
+                    by_item_id.clear()
+                    applied += 1
+                else:
+                    product_id = by_item_id.get(operation['cart_item_id'])
+                    if product_id not in items:
+                        continue
+                    if op == 'update' and operation['quantity'] > 0:
+                        items[product_id]['quantity'] = operation['quantity']
+                    else:
+                        del items[product_id]
+                        del by_item_id[operation['cart_item_id']]
+                    applied += 1
+            self._mark_dirty(user_id)
+        return applied
+
+    def _take_dirty(self, user_ids, wait=False):
+        """Snapshot dirty carts for writing, moving them from dirty to writing
+
+        Carts already being written are skipped, or with `wait` waited for.
+        """
+        with self._lock:
+            if wait:
+                while any(user_id in self._writing for user_id in user_ids):
+                    self._written.wait()
+            batch = []
+            for user_id in user_ids:
+                if user_id in self._dirty and user_id not in self._writing and user_id in self._carts:
+                    state = self._carts[user_id]
+                    items = [dict(item) for item in state['items'].values()]
+                    batch.append((user_id, state['cart_id'], state['version'], items))
+                    self._writing.add(user_id)
+                    self._dirty.discard(user_id)
+            return batch
+
+    def _settle(self, batch, stored, conflicts):
+        """Record the outcome of writing a batch; carts neither stored nor in conflict stay dirty"""
+        now = time.monotonic()
+        with self._lock:
+            for user_id, _, _, _ in batch:
+                self._writing.discard(user_id)
+                state = self._carts.get(user_id)
+                if user_id in stored:
+                    if state is not None:
+                        state['cart_id'], state['version'] = stored[user_id]
+                        state['synced'] = now
+                elif user_id in conflicts:
+                    # Changes made meanwhile are based on the stale copy too
+                    self._dirty.discard(user_id)
+                    if state is not None:
+                        state['synced'] = float('-inf')
+                else:
+                    self._dirty.add(user_id)
+            self._written.notify_all()
+
+        if conflicts:
+            logger.warning(
+                "Dropped local changes to %d cart(s) changed by another worker",
+                len(conflicts), extra={'user_ids': sorted(conflicts)[:20]}
+            )
+        bus.publish_many('carts', list(stored))
+
+    def _write(self, batch, db):
+        """Persist a batch, retrying cart by cart if the batch as a whole fails"""
+        stored, conflicts = {}, set()
+        try:
+            try:
+                stored, conflicts = Cart.save_many(batch, db)
+            except Exception:
+                db.rollback()
+                for cart in batch:
+                    try:
+                        cart_stored, cart_conflicts = Cart.save_many([cart], db)
+                    except Exception:
+                        db.rollback()
+                        logger.exception("Failed to write back cart for user %s", cart[0])
+                    else:
+                        stored.update(cart_stored)
+                        conflicts |= cart_conflicts
+        finally:
+            self._settle(batch, stored, conflicts)
+
+    def flush(self, user_id, db=None):
+        """Synchronously write a user's cart back (e.g. before checkout)
+
+        Raises if the write fails, leaving the cart dirty. Returns False if
+        another worker changed the cart first, in which case the local
+        changes are dropped and the cart is reloaded on next access.
+        """
+        batch = self._take_dirty([user_id], wait=True)
+        if not batch:
+            return True
+        stored, conflicts = {}, set()
+        try:
+            db = db or get_db()
+            stored, conflicts = Cart.save_many(batch, db)
+        except Exception:
+            if db is not None:
+                db.rollback()
+            raise
+        finally:
+            self._settle(batch, stored, conflicts)
+        return not conflicts
+
+    def flush_all(self):
+        """Write back every dirty cart using the store's own connection"""
+        with self._lock:
+            user_ids = list(self._dirty)
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = self._take_dirty(user_ids[start:start + self.batch_size])
+            if not batch:
+                continue
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = connect()
+            except Exception:
+                self._settle(batch, {}, set())
+                raise
+            self._write(batch, self._conn)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            for user_id in [u for u, s in self._carts.items()
+                            if s.get('touched', 0) < cutoff and not self._pending(u)]:
+                del self._carts[user_id]
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush_all()
+                self._evict_idle()
+            except Exception:
+                logger.exception("Cart write-back failed")
+                if self._conn is not None and not self._conn.closed:
+                    self._conn.close()
+                self._conn = None
+
+    def _start_flusher(self):
+        # Started lazily on the first mutation so that it runs in the worker
+        # process rather than in a pre-fork master
+        self._flusher = threading.Thread(target=self._run, name='cart-writeback', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush_all)
+
+cart_store = CartStore()
@@ -0,0 +1,106 @@
+from database.db import get_db, connect
+from utils.invalidation import bus
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Categories change only through migrations and admin edits; the snapshot is
+# reloaded at most this often (or immediately after Category.invalidate())
+CATEGORY_REFRESH_SECONDS = int(os.getenv('CATEGORY_REFRESH_SECONDS', 300))
+
+class CategorySnapshot:
+    """Immutable copy of the categories table with a content version
+
+    `version` is a hash of the rows, so it only changes when a category
+    does; it is used as the ETag of GET /api/categories and as the cache
+    busting parameter for immutable responses.
+    """
+    __slots__ = ('categories', 'names', 'version', 'loaded_at')
+
+    def __init__(self, rows):
+        self.categories = tuple(rows)
+        self.names = {row['category_id']: row['name'] for row in rows}
+        raw = json.dumps(rows, sort_keys=True, default=str).encode('utf-8')
+        self.version = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        self.loaded_at = time.monotonic()
+
+_snapshot = None
+_lock = threading.Lock()
+
+class Category:
+    @staticmethod
+    def load(db=None):
+        """Read the categories table into a new snapshot"""
+        db = db or get_db()
+        with db.cursor() as cursor:
+            sql = """
+                SELECT category_id, name, description, image_url
+                FROM categories
+                ORDER BY name
+            """
+            cursor.execute(sql)
+            return CategorySnapshot([dict(row) for row in cursor.fetchall()])
+
+    @staticmethod
+    def snapshot(db=None):
+        """Get the current snapshot, reloading it when stale"""
+        global _snapshot
+        current = _snapshot
+        if current is not None and time.monotonic() - current.loaded_at < CATEGORY_REFRESH_SECONDS:
+            return current
+        with _lock:
+            # Another thread may have reloaded it while we waited
+            if _snapshot is not current:
+                return _snapshot
+            try:
+                _snapshot = Category.load(db)
+            except Exception:
+                if current is None:
+                    raise
+                # Keep serving the previous snapshot until the database is back
+                logger.exception("Reloading categories failed, keeping version %s", current.version)
+                current.loaded_at = time.monotonic()
+            return _snapshot
+
+    @staticmethod
+    def get_all():
+        """Get every category"""
+        return Category.snapshot().categories
+
+    @staticmethod
+    def names():
+        """Map of category_id to name"""
+        return Category.snapshot().names
+
+    @staticmethod
+    def invalidate():
+        """Force a reload on the next access in every worker (call after changing categories)"""
+        _expire()
+        bus.publish('categories', None)
+
+def _expire(key=None):
+    with _lock:
+        if _snapshot is not None:
+            _snapshot.loaded_at = float('-inf')
+
+bus.subscribe('categories', _expire)
+
+def warm():
+    """Load the snapshot at startup so the first requests do not pay for it"""
+    global _snapshot
+    try:
+        db = connect()
+    except Exception:
+        logger.warning("Categories not preloaded, database unavailable")
+        return
+    try:
+        _snapshot = Category.load(db)
+    except Exception:
+        logger.warning("Categories not preloaded", exc_info=True)
+    finally:
+        db.close()
@@ -0,0 +1,298 @@
+from database.db import get_db
+from utils.auth import generate_uuid
+from models.user import User
+from utils.invalidation import bus
+
+TRANSACTION_TYPES = ('earned', 'redeemed', 'expired', 'adjustment')
+
+# Adds one ledger row to the per-user running balances. Shared by the single
+# insert below and by bulk writers, which feed it from a set of rows.
+BALANCE_UPSERT = """
+    INSERT INTO loyalty_balances (
+        user_id, earned, redeemed, expired, adjustment, balance
+    )
+    SELECT user_id,
+           COALESCE(SUM(points) FILTER (WHERE transaction_type = 'earned'), 0),
+           COALESCE(SUM(points) FILTER (WHERE transaction_type = 'redeemed'), 0),
+           COALESCE(SUM(points) FILTER (WHERE transaction_type = 'expired'), 0),
+           COALESCE(SUM(points) FILTER (WHERE transaction_type = 'adjustment'), 0),
+           SUM(points)
+    FROM {source}
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        earned = loyalty_balances.earned + EXCLUDED.earned,
+        redeemed = loyalty_balances.redeemed + EXCLUDED.redeemed,
+        expired = loyalty_balances.expired + EXCLUDED.expired,
+        adjustment = loyalty_balances.adjustment + EXCLUDED.adjustment,
+        balance = loyalty_balances.balance + EXCLUDED.balance,
+        date_updated = CURRENT_TIMESTAMP
+"""
+
+# Users whose balance snapshot or users.loyalty_points disagree with their
+# ledger. {ledger} and {users} optionally narrow the check to a set of users.
+RECONCILE_SQL = """
+    WITH expected AS (
+        SELECT user_id,
+               COALESCE(SUM(points) FILTER (WHERE transaction_type = 'earned'), 0) AS earned,
+               COALESCE(SUM(points) FILTER (WHERE transaction_type = 'redeemed'), 0) AS redeemed,
+               COALESCE(SUM(points) FILTER (WHERE transaction_type = 'expired'), 0) AS expired,
+               COALESCE(SUM(points) FILTER (WHERE transaction_type = 'adjustment'), 0) AS adjustment,
+               SUM(points) AS balance
+        FROM loyalty_points_transactions
+        {ledger}
+        GROUP BY user_id
+    )
+    SELECT u.user_id,
+           b.earned AS snapshot_earned, e.earned AS ledger_earned,
+           b.redeemed AS snapshot_redeemed, e.redeemed AS ledger_redeemed,
+           b.expired AS snapshot_expired, e.expired AS ledger_expired,
+           b.adjustment AS snapshot_adjustment, e.adjustment AS ledger_adjustment,
+           b.balance AS snapshot_balance, e.balance AS ledger_balance,
+           u.loyalty_points AS account_balance
+    FROM users u
+    LEFT JOIN expected e ON e.user_id = u.user_id
+    LEFT JOIN loyalty_balances b ON b.user_id = u.user_id
+    WHERE (b.user_id IS NOT NULL OR e.user_id IS NOT NULL OR COALESCE(u.loyalty_points, 0) <> 0)
+      {users}
+      AND ((b.earned, b.redeemed, b.expired, b.adjustment, b.balance)
+           IS DISTINCT FROM
+           (COALESCE(e.earned, 0), COALESCE(e.redeemed, 0), COALESCE(e.expired, 0),
+            COALESCE(e.adjustment, 0), COALESCE(e.balance, 0))
+           OR COALESCE(u.loyalty_points, 0) <> COALESCE(e.balance, 0))
+"""
+
+class LoyaltyPoints:
+    @staticmethod
+    def record(user_id, points, transaction_type, description=None, order_id=None, db=None):
+        """Insert a ledger row and update the running balances in one statement
+
+        `points` is signed: positive for earned, negative for redeemed and
+        expired. Returns (transaction_id, new balance), or None if the user
+        does not exist.
+        """
+        db = db or get_db()
+        transaction_id = generate_uuid()
+
+        with db.cursor() as cursor:
+            # The ledger row, the balance snapshot and users.loyalty_points
+            # are written by one statement, so they can never drift apart.
+            # The ledger and snapshot writes read from the users update, so
+            # the users row is locked first, in the same order as redeem()
+            # and concurrent earns and redemptions cannot deadlock.
+            sql = f"""
+                WITH account AS (
+                    UPDATE users SET loyalty_points = COALESCE(loyalty_points, 0) + %(points)s
+                    WHERE user_id = %(user_id)s
+                    RETURNING user_id
+                ),
+                entry AS (
+                    INSERT INTO loyalty_points_transactions (
+                        transaction_id, user_id, order_id, points,
+                        transaction_type, description
+                    )
+                    SELECT %(transaction_id)s, user_id, %(order_id)s, %(points)s,
+                           %(transaction_type)s, %(description)s
+                    FROM account
+                    RETURNING transaction_id, user_id, points, transaction_type
+                ),
+                snapshot AS (
+                    {BALANCE_UPSERT.format(source='entry')}
+                    RETURNING balance
+                )
+                SELECT balance FROM snapshot
+            """
+            cursor.execute(sql, {
+                'user_id': user_id,
+                'points': points,
+                'transaction_id': transaction_id,
+                'order_id': order_id,
+                'transaction_type': transaction_type,
+                'description': description
+            })
+            row = cursor.fetchone()
+            db.commit()
+
+            if not row:
+                return None
+            # users.loyalty_points is part of the cached user row
+            User.get_by_id.invalidate(user_id)
+
+            return transaction_id, row['balance']
+
+    @staticmethod
+    def redeem(user_id, points, description=None, db=None):
+        """Atomically redeem points, returns (transaction_id, remaining) or None
+
+        The balance check and the debit are one conditional UPDATE, so two
+        concurrent redemptions serialise on the user's row lock and the
+        second re-checks the balance after the first commits; an account
+        can never be overspent. The ledger row and snapshot are written in
+        the same statement.
+        """
+        db = db or get_db()
+        transaction_id = generate_uuid()
+
+        with db.cursor() as cursor:
+            sql = f"""
+                WITH account AS (
+                    UPDATE users SET loyalty_points = loyalty_points - %(points)s
+                    WHERE user_id = %(user_id)s AND loyalty_points >= %(points)s
+                    RETURNING user_id, loyalty_points
+                ),
+                entry AS (
+                    INSERT INTO loyalty_points_transactions (
+                        transaction_id, user_id, points, transaction_type, description
+                    )
+                    SELECT %(transaction_id)s, user_id, -%(points)s, 'redeemed', %(description)s
+                    FROM account
+                    RETURNING transaction_id, user_id, points, transaction_type
+                ),
+                snapshot AS (
+                    {BALANCE_UPSERT.format(source='entry')}
+                )
+                SELECT loyalty_points FROM account
+            """
+            cursor.execute(sql, {
+                'user_id': user_id,
+                'points': points,
+                'transaction_id': transaction_id,
+                'description': description
+            })
+            row = cursor.fetchone()
+            db.commit()
+
+            if not row:
+                return None
+            User.get_by_id.invalidate(user_id)
+            return transaction_id, row['loyalty_points']
+
+    @staticmethod
+    def get_summary(user_id):
+        """Get a user's loyalty summary from the balance snapshot (single row)
+
+        Points pending on undelivered orders are summed from orders in the
+        same query (served by idx_orders_user_status).
+        """
+        db = get_db()
+        with db.cursor() as cursor:
+            sql = """
+                SELECT COALESCE(b.earned, 0) AS earned,
+                       COALESCE(b.redeemed, 0) AS redeemed,
+                       COALESCE(b.expired, 0) AS expired,
+                       COALESCE(b.adjustment, 0) AS adjustment,
+                       COALESCE(b.balance, 0) AS balance,
+                       (SELECT COALESCE(SUM(o.loyalty_points_earned), 0)
+                        FROM orders o
+                        WHERE o.user_id = u.user_id
+                          AND o.status IN ('pending', 'processing', 'shipped')) AS pending
+                FROM (SELECT %s::varchar AS user_id) u
+                LEFT JOIN loyalty_balances b ON b.user_id = u.user_id
+            """
+            cursor.execute(sql, (user_id,))
+            row = cursor.fetchone()
+
+        return {
+            'total': row['earned'] + max(row['adjustment'], 0),
+            'redeemable': row['balance'],
+            'pending': row['pending'],
+            'redeemed': -row['redeemed'],
+            'expired': -row['expired']
+        }
+
+    @staticmethod
+    def get_transactions(user_id, page=1, limit=10):
+        """Get a page of a user's ledger, newest first"""
+        db = get_db()
+        offset = (page - 1) * limit
+
+        with db.cursor() as cursor:
+            # Both queries are served by idx_loyalty_transactions_user_date
+            cursor.execute(
+                "SELECT COUNT(*) AS count FROM loyalty_points_transactions WHERE user_id = %s",
+                (user_id,)
+            )
+            total = cursor.fetchone()['count']
+
+            sql = """
+                SELECT transaction_id, order_id, points, transaction_type,
+                       description, date_created
+                FROM loyalty_points_transactions
+                WHERE user_id = %s
+                ORDER BY date_created DESC, transaction_id DESC
+                LIMIT %s OFFSET %s
+            """
+            cursor.execute(sql, (user_id, limit, offset))
+            return cursor.fetchall(), total
+
+    @staticmethod
+    def reconcile(db, fix=False):
+        """Compare the balance snapshots and users.loyalty_points against the ledger
+
+        Returns the mismatching rows (snapshot and account vs. ledger
+        values). With fix=True the accounts of those users are locked, the
+        comparison is repeated under the lock and both the snapshots and
+        users.loyalty_points are rewritten from the ledger in the same
+        transaction. The rows returned then are the ones that were fixed.
+        """
+        with db.cursor() as cursor:
+            cursor.execute(RECONCILE_SQL.format(ledger='', users=''))
+            mismatches = cursor.fetchall()
+
+            if fix and mismatches:
+                user_ids = [row['user_id'] for row in mismatches]
+                # Every ledger writer locks the users row first, so once these
+                # are held the ledger of these users cannot move until commit.
+                # Ordered like the expiry job's locks, so the two cannot deadlock.
+                cursor.execute(
+                    "SELECT 1 FROM users WHERE user_id = ANY(%s) ORDER BY user_id FOR UPDATE",
+                    (user_ids,)
+                )
+                # Recheck from a snapshot taken after the locks, dropping users
+                # whose in-flight writes have caught up in the meantime
+                sql = RECONCILE_SQL.format(
+                    ledger='WHERE user_id = ANY(%(user_ids)s)',
+                    users='AND u.user_id = ANY(%(user_ids)s)'
+                )
+                cursor.execute(sql, {'user_ids': user_ids})
+                mismatches = cursor.fetchall()
+
+            if fix and mismatches:
+                sql = """
+                    WITH expected AS (
+                        SELECT u.user_id,
+                               COALESCE(SUM(t.points) FILTER (WHERE t.transaction_type = 'earned'), 0) AS earned,
+                               COALESCE(SUM(t.points) FILTER (WHERE t.transaction_type = 'redeemed'), 0) AS redeemed,
+                               COALESCE(SUM(t.points) FILTER (WHERE t.transaction_type = 'expired'), 0) AS expired,
+                               COALESCE(SUM(t.points) FILTER (WHERE t.transaction_type = 'adjustment'), 0) AS adjustment,
+                               COALESCE(SUM(t.points), 0) AS balance
+                        FROM users u
+                        LEFT JOIN loyalty_points_transactions t ON t.user_id = u.user_id
+                        WHERE u.user_id = ANY(%(user_ids)s)
+                        GROUP BY u.user_id
+                    ),
+                    snapshot AS (
+                        INSERT INTO loyalty_balances (
+                            user_id, earned, redeemed, expired, adjustment, balance
+                        )
+                        SELECT user_id, earned, redeemed, expired, adjustment, balance
+                        FROM expected
+                        ON CONFLICT (user_id) DO UPDATE SET
+                            earned = EXCLUDED.earned,
+                            redeemed = EXCLUDED.redeemed,
+                            expired = EXCLUDED.expired,
+                            adjustment = EXCLUDED.adjustment,
+                            balance = EXCLUDED.balance,
+                            date_updated = CURRENT_TIMESTAMP
+                    )
+                    UPDATE users u SET loyalty_points = e.balance
+                    FROM expected e
+                    WHERE u.user_id = e.user_id
+                """
+                cursor.execute(sql, {'user_ids': [row['user_id'] for row in mismatches]})
+            db.commit()
+
+            if fix and mismatches:
+                # users.loyalty_points is part of the cached user row
+                bus.publish_many('user_by_id', [row['user_id'] for row in mismatches])
+
+            return mismatches
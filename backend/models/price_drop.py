@@ -0,0 +1,69 @@
+class PriceDrop:
+    @staticmethod
+    def process_batch(db, batch_size=10000):
+        """Turn one batch of logged price drops into wishlist notifications
+
+        Everything happens in one set-based statement: the pending changes
+        are claimed (SKIP LOCKED, so several runners can share the log),
+        collapsed to one drop per product, joined against wishlist_items and
+        inserted as notifications. The unique key on (user_id, product_id,
+        new_price) drops duplicates. The caller commits.
+        Returns (changes processed, notifications created).
+        """
+        with db.cursor() as cursor:
+            sql = """
+                WITH batch AS (
+                    SELECT change_id, product_id, old_price, new_price
+                    FROM product_price_changes
+                    WHERE processed = FALSE
+                    ORDER BY change_id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ),
+                drops AS (
+                    -- Several updates to one product collapse into the price
+                    -- before the first and after the last
+                    SELECT product_id,
+                           (array_agg(old_price ORDER BY change_id))[1] AS old_price,
+                           (array_agg(new_price ORDER BY change_id DESC))[1] AS new_price
+                    FROM batch
+                    GROUP BY product_id
+                ),
+                notified AS (
+                    INSERT INTO price_drop_notifications (user_id, product_id, old_price, new_price)
+                    SELECT DISTINCT w.user_id, d.product_id, d.old_price, d.new_price
+                    FROM drops d
+                    JOIN wishlist_items wi ON wi.product_id = d.product_id
+                    JOIN wishlist w ON w.wishlist_id = wi.wishlist_id
+                    WHERE d.new_price < d.old_price
+                    ON CONFLICT (user_id, product_id, new_price) DO NOTHING
+                    RETURNING 1
+                ),
+                done AS (
+                    UPDATE product_price_changes
+                    SET processed = TRUE
+                    WHERE change_id IN (SELECT change_id FROM batch)
+                    RETURNING 1
+                )
+                SELECT (SELECT COUNT(*) FROM done) AS changes,
+                       (SELECT COUNT(*) FROM notified) AS notifications
+            """
+            cursor.execute(sql, (batch_size,))
+            row = cursor.fetchone()
+            return row['changes'], row['notifications']
+
+    @staticmethod
+    def process_pending(db, batch_size=10000):
+        """Process the change log until it is empty, committing each batch"""
+        total_changes = total_notifications = 0
+        while True:
+            try:
+                changes, notifications = PriceDrop.process_batch(db, batch_size)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            total_changes += changes
+            total_notifications += notifications
+            if changes < batch_size:
+                return total_changes, total_notifications
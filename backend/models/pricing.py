@@ -0,0 +1,102 @@
+from database.db import get_db
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+def load_products(product_ids, db=None):
+    """Load the pricing columns for a set of products in a single query"""
+    if not product_ids:
+        return {}
+    db = db or get_db()
+    with db.cursor() as cursor:
+        sql = """
+            SELECT p.product_id, p.name, p.price, p.sale_price, p.stock_quantity,
+                   p.loyalty_points_earned, p.is_active AND s.is_active AS is_available,
+                   p.store_id, s.name AS store_name
+            FROM products p
+            JOIN stores s ON p.store_id = s.store_id
+            WHERE p.product_id = ANY(%s)
+        """
+        cursor.execute(sql, (list(product_ids),))
+        return {row['product_id']: row for row in cursor.fetchall()}
+
+def price_lines(lines, db=None):
+    """Price a list of cart/checkout lines
+
+    `lines` are dicts with at least product_id and quantity. All products
+    are loaded with one query and the totals are computed in a single pass,
+    so the cost does not grow with one lookup per line. Shared by the cart
+    and by checkout.
+    """
+    products = load_products({line['product_id'] for line in lines}, db)
+
+    items = []
+    stores = {}
+    warnings = []
+    subtotal = Decimal('0')
+    points = 0
+
+    for line in lines:
+        product = products.get(line['product_id'])
+        quantity = line['quantity']
+
+        if product is None or not product['is_available']:
+            warnings.append({
+                'product_id': line['product_id'],
+                'code': 'unavailable',
+                'message': 'Product is no longer available'
+            })
+            items.append(dict(line, available=False))
+            continue
+
+        unit_price = product['price']
+        if product['sale_price'] is not None and product['sale_price'] < unit_price:
+            unit_price = product['sale_price']
+        line_total = (unit_price * quantity).quantize(CENT, rounding=ROUND_HALF_UP)
+        line_points = (product['loyalty_points_earned'] or 0) * quantity
+
+        stock = product['stock_quantity'] or 0
+        if stock <= 0:
+            warnings.append({
+                'product_id': line['product_id'],
+                'code': 'out_of_stock',
+                'message': f"{product['name']} is out of stock"
+            })
+        elif quantity > stock:
+            warnings.append({
+                'product_id': line['product_id'],
+                'code': 'insufficient_stock',
+                'message': f"Only {stock} of {product['name']} left in stock",
+                'available': stock
+            })
+
+        items.append(dict(
+            line,
+            available=True,
+            name=product['name'],
+            store_id=product['store_id'],
+            unit_price=unit_price,
+            regular_price=product['price'],
+            line_total=line_total,
+            loyalty_points=line_points
+        ))
+
+        store = stores.setdefault(product['store_id'], {
+            'store_id': product['store_id'],
+            'store_name': product['store_name'],
+            'subtotal': Decimal('0'),
+            'item_count': 0
+        })
+        store['subtotal'] += line_total
+        store['item_count'] += quantity
+        subtotal += line_total
+        points += line_points
+
+    return {
+        'items': items,
+        'stores': list(stores.values()),
+        'subtotal': subtotal,
+        'total': subtotal,
+        'loyalty_points_earned': points,
+        'warnings': warnings
+    }
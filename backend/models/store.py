@@ -1,10 +1,28 @@
 from database.db import get_db
 from utils.auth import generate_uuid
+from utils.cache import cached, TTLCache, MISSING
+import os
+
+# Columns of store listings, selectable with ?fields=
+LIST_COLUMNS = (
+    'store_id', 'owner_id', 'name', 'description', 'address', 'city',
+    'phone', 'email', 'logo_url', 'hero_image_url', 'date_created', 'avg_rating'
+)
+
+# Supplier dashboard summaries are recomputed at most this often per owner
+summary_cache = TTLCache(
+    maxsize=int(os.getenv('SUPPLIER_SUMMARY_CACHE_SIZE', 2000)),
+    ttl=int(os.getenv('SUPPLIER_SUMMARY_TTL', 30)),
+    name='supplier_summary'
+)
+
+LOW_STOCK_THRESHOLD = 5
+SUMMARY_LIST_LIMIT = 10
 
 class Store:
     @staticmethod
-    def get_all(page=1, limit=10):
-        """Get all stores with pagination"""
+    def get_all(page=1, limit=10, fields=None):
+        """Get all stores with pagination, optionally only some LIST_COLUMNS"""
         db = get_db()
         offset = (page - 1) * limit
         
@@ -14,9 +32,8 @@ class Store:
             total = cursor.fetchone()['count']
             
             # Get stores
-            sql = """
-                SELECT store_id, owner_id, name, description, address, city, 
-                phone, email, logo_url, hero_image_url, date_created, avg_rating 
+            sql = f"""
+                SELECT {', '.join(fields or LIST_COLUMNS)}
                 FROM stores 
                 WHERE is_active = TRUE 
                 ORDER BY name 
@@ -28,6 +45,7 @@ class Store:
             return stores, total
     
     @staticmethod
+    @cached('store_by_id', ttl=60)
     def get_by_id(store_id):
         """Get store by ID"""
         db = get_db()
@@ -56,6 +74,86 @@ class Store:
             cursor.execute(sql, (owner_id,))
             return cursor.fetchall()
     
+    @staticmethod
+    def get_owner_summary(owner_id):
+        """Get the supplier dashboard for an owner in one query (cached briefly)
+
+        Returns the owner's active stores, product counts by status, the
+        lowest-stock products, pending orders (oldest first, with the total
+        count) and the latest product reviews across all of their stores.
+        Callers get a shallow copy, as with @cached lookups.
+        """
+        summary = summary_cache.get(owner_id)
+        if summary is not MISSING:
+            return dict(summary)
+        
+        db = get_db()
+        with db.cursor() as cursor:
+            # Every section is a CTE over the owner's stores; the lists are
+            # aggregated to JSON so the whole dashboard is a single row
+            sql = """
+                WITH owned AS (
+                    SELECT store_id, name, city, logo_url, avg_rating, date_created
+                    FROM stores
+                    WHERE owner_id = %(owner_id)s AND is_active = TRUE
+                ),
+                product_counts AS (
+                    SELECT COUNT(*) AS total,
+                           COUNT(*) FILTER (WHERE p.is_active) AS active,
+                           COUNT(*) FILTER (WHERE NOT p.is_active) AS inactive,
+                           COUNT(*) FILTER (WHERE p.is_active AND p.stock_quantity = 0) AS out_of_stock,
+                           COUNT(*) FILTER (WHERE p.is_active AND p.stock_quantity > 0
+                                            AND p.stock_quantity <= %(low_stock)s) AS low_stock,
+                           COUNT(*) FILTER (WHERE p.is_active AND p.sale_price IS NOT NULL) AS on_sale,
+                           COUNT(*) FILTER (WHERE p.is_active AND p.is_featured) AS featured
+                    FROM products p
+                    JOIN owned o ON o.store_id = p.store_id
+                ),
+                low_stock AS (
+                    SELECT p.product_id, p.store_id, p.name, p.stock_quantity
+                    FROM products p
+                    JOIN owned o ON o.store_id = p.store_id
+                    WHERE p.is_active = TRUE AND p.stock_quantity <= %(low_stock)s
+                    ORDER BY p.stock_quantity, p.name
+                    LIMIT %(limit)s
+                ),
+                pending AS (
+                    SELECT o.order_id, o.store_id, o.user_id, o.total_amount, o.status,
+                           o.payment_status, o.date_created
+                    FROM orders o
+                    JOIN owned s ON s.store_id = o.store_id
+                    WHERE o.status IN ('pending', 'processing')
+                ),
+                recent_reviews AS (
+                    SELECT r.review_id, r.product_id, p.name AS product_name, p.store_id,
+                           r.rating, r.comment, r.date_created
+                    FROM reviews r
+                    JOIN products p ON p.product_id = r.product_id
+                    JOIN owned o ON o.store_id = p.store_id
+                    ORDER BY r.date_created DESC
+                    LIMIT %(limit)s
+                )
+                SELECT
+                    (SELECT COALESCE(json_agg(owned ORDER BY name), '[]') FROM owned) AS stores,
+                    (SELECT row_to_json(product_counts) FROM product_counts) AS products,
+                    (SELECT COALESCE(json_agg(low_stock ORDER BY stock_quantity, name), '[]')
+                     FROM low_stock) AS low_stock,
+                    (SELECT COUNT(*) FROM pending) AS pending_order_count,
+                    (SELECT COALESCE(json_agg(oldest ORDER BY date_created), '[]')
+                     FROM (SELECT * FROM pending ORDER BY date_created LIMIT %(limit)s) oldest) AS pending_orders,
+                    (SELECT COALESCE(json_agg(recent_reviews ORDER BY date_created DESC), '[]')
+                     FROM recent_reviews) AS recent_reviews
+            """
+            cursor.execute(sql, {
+                'owner_id': owner_id,
+                'low_stock': LOW_STOCK_THRESHOLD,
+                'limit': SUMMARY_LIST_LIMIT
+            })
+            summary = dict(cursor.fetchone())
+        
+        summary_cache.set(owner_id, summary)
+        return dict(summary)
+    
     @staticmethod
     def create(store_data):
         """Create a new store"""
@@ -83,6 +181,7 @@ class Store:
                 store_data.get('opening_hours')
             ))
             db.commit()
+            summary_cache.invalidate(store_data['owner_id'])
             
             return store_id
     
@@ -118,19 +217,27 @@ class Store:
         values.append(store_id)  # For the WHERE clause
         
         with db.cursor() as cursor:
-            sql = f"UPDATE stores SET {', '.join(update_fields)} WHERE store_id = %s"
+            sql = f"UPDATE stores SET {', '.join(update_fields)} WHERE store_id = %s RETURNING owner_id"
             cursor.execute(sql, tuple(values))
+            row = cursor.fetchone()
             db.commit()
+            Store.get_by_id.invalidate(store_id)
+            if row:
+                summary_cache.invalidate(row['owner_id'])
             
-            return cursor.rowcount > 0
+            return row is not None
     
     @staticmethod
     def delete(store_id):
         """Soft delete a store (mark as inactive)"""
         db = get_db()
         with db.cursor() as cursor:
-            sql = "UPDATE stores SET is_active = FALSE WHERE store_id = %s"
+            sql = "UPDATE stores SET is_active = FALSE WHERE store_id = %s RETURNING owner_id"
             cursor.execute(sql, (store_id,))
+            row = cursor.fetchone()
             db.commit()
+            Store.get_by_id.invalidate(store_id)
+            if row:
+                summary_cache.invalidate(row['owner_id'])
             
-            return cursor.rowcount > 0
\ No newline at end of file
+            return row is not None
\ No newline at end of file
@@ -1,9 +1,22 @@
 from database.db import get_db
 from utils.auth import generate_uuid
+from utils.cache import cached
 import json
 
+def _verification_documents_json(supplier_data):
+    """Normalise verification_documents to a JSON string (or None)"""
+    docs = supplier_data.get('verification_documents')
+    if not docs:
+        return None
+    if isinstance(docs, dict):
+        return json.dumps(docs)
+    if isinstance(docs, str):
+        return docs
+    return None
+
 class Supplier:
     @staticmethod
+    @cached('supplier_by_user_id', ttl=60)
     def get_by_user_id(user_id):
         """Get supplier by user ID"""
         db = get_db()
@@ -19,6 +32,7 @@ class Supplier:
             return cursor.fetchone()
     
     @staticmethod
+    @cached('supplier_by_id', ttl=60)
     def get_by_id(supplier_id):
         """Get supplier by supplier ID"""
         db = get_db()
@@ -40,12 +54,7 @@ class Supplier:
         supplier_id = generate_uuid()
         
         # Convert verification_documents to JSON if provided
-        verification_docs = None
-        if supplier_data.get('verification_documents'):
-            if isinstance(supplier_data['verification_documents'], dict):
-                verification_docs = json.dumps(supplier_data['verification_documents'])
-            elif isinstance(supplier_data['verification_documents'], str):
-                verification_docs = supplier_data['verification_documents']
+        verification_docs = _verification_documents_json(supplier_data)
         
         with db.cursor() as cursor:
             sql = """
@@ -63,10 +72,65 @@ class Supplier:
                 supplier_data.get('tax_id'),
                 verification_docs
             ))
-            # No commit here as we're handling transactions at a higher level
+            db.commit()
+            # Only after the commit: a lookup in between would cache the
+            # user as having no supplier again
+            Supplier.get_by_user_id.invalidate(supplier_data['user_id'])
             
             return supplier_id
     
+    @staticmethod
+    def register(user_data, password_hash, supplier_data):
+        """Create the user and supplier rows in one statement.
+        
+        Returns (user_id, supplier_id), or None if the email is already taken.
+        """
+        db = get_db()
+        user_id = generate_uuid()
+        supplier_id = generate_uuid()
+        
+        with db.cursor() as cursor:
+            # The supplier insert reads from the user CTE, so a conflicting
+            # email produces no user row and therefore no supplier row either
+            sql = """
+                WITH new_user AS (
+                    INSERT INTO users (
+                        user_id, email, password_hash, first_name, last_name, 
+                        phone, address, city, role
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'supplier')
+                    ON CONFLICT (email) DO NOTHING
+                    RETURNING user_id
+                )
+                INSERT INTO suppliers (
+                    supplier_id, user_id, business_name, business_address, 
+                    business_phone, tax_id, verification_documents
+                )
+                SELECT %s, user_id, %s, %s, %s, %s, %s FROM new_user
+                RETURNING supplier_id, user_id
+            """
+            cursor.execute(sql, (
+                user_id,
+                user_data['email'],
+                password_hash,
+                user_data['first_name'],
+                user_data['last_name'],
+                user_data.get('phone'),
+                user_data.get('address'),
+                user_data.get('city'),
+                supplier_id,
+                supplier_data['business_name'],
+                supplier_data['business_address'],
+                supplier_data['business_phone'],
+                supplier_data.get('tax_id'),
+                _verification_documents_json(supplier_data)
+            ))
+            row = cursor.fetchone()
+            db.commit()
+            
+            if not row:
+                return None
+            return row['user_id'], row['supplier_id']
+    
     @staticmethod
     def update(supplier_id, supplier_data):
         """Update supplier information"""
@@ -102,19 +166,30 @@ class Supplier:
         values.append(supplier_id)  # For the WHERE clause
         
         with db.cursor() as cursor:
-            sql = f"UPDATE suppliers SET {', '.join(update_fields)} WHERE supplier_id = %s"
+            sql = f"UPDATE suppliers SET {', '.join(update_fields)} WHERE supplier_id = %s RETURNING user_id"
             cursor.execute(sql, tuple(values))
+            row = cursor.fetchone()
             db.commit()
+            Supplier._invalidate(supplier_id, row)
             
-            return cursor.rowcount > 0
+            return row is not None
     
     @staticmethod
     def verify(supplier_id, verified=True):
         """Set verification status for a supplier"""
         db = get_db()
         with db.cursor() as cursor:
-            sql = "UPDATE suppliers SET is_verified = %s WHERE supplier_id = %s"
+            sql = "UPDATE suppliers SET is_verified = %s WHERE supplier_id = %s RETURNING user_id"
             cursor.execute(sql, (verified, supplier_id))
+            row = cursor.fetchone()
             db.commit()
+            Supplier._invalidate(supplier_id, row)
             
-            return cursor.rowcount > 0
\ No newline at end of file
+            return row is not None
+
+    @staticmethod
+    def _invalidate(supplier_id, row):
+        """Drop a supplier from both lookup caches after a write"""
+        Supplier.get_by_id.invalidate(supplier_id)
+        if row:
+            Supplier.get_by_user_id.invalidate(row['user_id'])
\ No newline at end of file
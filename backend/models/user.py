@@ -1,8 +1,35 @@
-from database.db import get_db
+from database.db import get_db, InstrumentedCursor
 from utils.auth import generate_uuid, hash_password
+from utils.cache import cached
+
+# Columns exposed by admin listings and exports (never password/reset data)
+LIST_COLUMNS = (
+    'user_id', 'email', 'first_name', 'last_name', 'phone', 'address',
+    'city', 'role', 'loyalty_points', 'date_joined', 'last_login', 'is_active'
+)
+
+def _list_filters(filters):
+    """Build the WHERE clause for admin user listings"""
+    conditions = []
+    values = []
+    
+    if filters.get('role'):
+        conditions.append("role = %s")
+        values.append(filters['role'])
+    
+    if filters.get('city'):
+        conditions.append("city = %s")
+        values.append(filters['city'])
+    
+    if filters.get('is_active') is not None:
+        conditions.append("is_active = %s")
+        values.append(filters['is_active'])
+    
+    return conditions, values
 
 class User:
     @staticmethod
+    @cached('user_by_id', ttl=30)
     def get_by_id(user_id):
         """Get user by ID"""
         db = get_db()
@@ -15,6 +42,63 @@ class User:
             cursor.execute(sql, (user_id,))
             return cursor.fetchone()
     
+    @staticmethod
+    def get_all(limit=50, after=None, filters=None):
+        """Get a page of users ordered by newest first using keyset pagination
+        
+        `after` is the (date_joined, user_id) of the last row of the previous
+        page. Returns (users, has_more).
+        """
+        db = get_db()
+        conditions, values = _list_filters(filters or {})
+        
+        # Seek past the previous page instead of OFFSET so deep pages cost
+        # the same as the first one (served by the idx_users_*_joined indexes)
+        if after:
+            conditions.append("(date_joined, user_id) < (%s, %s)")
+            values.extend(after)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with db.cursor() as cursor:
+            sql = f"""
+                SELECT {', '.join(LIST_COLUMNS)}
+                FROM users
+                {where}
+                ORDER BY date_joined DESC, user_id DESC
+                LIMIT %s
+            """
+            # Fetch one extra row to know whether another page exists
+            cursor.execute(sql, tuple(values) + (limit + 1,))
+            users = cursor.fetchall()
+            
+            return users[:limit], len(users) > limit
+    
+    @staticmethod
+    def iter_all(filters=None, batch_size=2000):
+        """Stream every matching user through a server-side cursor
+        
+        Rows are yielded as tuples in LIST_COLUMNS order, fetched from the
+        server `batch_size` at a time so the full result is never buffered.
+        """
+        db = get_db()
+        conditions, values = _list_filters(filters or {})
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        # A named cursor is a server-side cursor in psycopg2; plain tuples
+        # skip the per-row dict construction of RealDictCursor
+        with db.cursor(name='users_export', cursor_factory=InstrumentedCursor) as cursor:
+            cursor.itersize = batch_size
+            sql = f"""
+                SELECT {', '.join(LIST_COLUMNS)}
+                FROM users
+                {where}
+                ORDER BY date_joined DESC, user_id DESC
+            """
+            cursor.execute(sql, tuple(values))
+            for row in cursor:
+                yield row
+    
     @staticmethod
     def get_by_email(email):
         """Get user by email"""
@@ -52,6 +136,39 @@ class User:
             
             return user_id
     
+    @staticmethod
+    def register(user_data, password_hash):
+        """Insert a new user in a single statement, returns None if the email is taken"""
+        db = get_db()
+        user_id = generate_uuid()
+        
+        with db.cursor() as cursor:
+            # ON CONFLICT replaces the separate get_by_email pre-check and
+            # closes the race between two signups with the same email
+            sql = """
+                INSERT INTO users (
+                    user_id, email, password_hash, first_name, last_name, 
+                    phone, address, city, role
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (email) DO NOTHING
+                RETURNING user_id
+            """
+            cursor.execute(sql, (
+                user_id,
+                user_data['email'],
+                password_hash,
+                user_data['first_name'],
+                user_data['last_name'],
+                user_data.get('phone'),
+                user_data.get('address'),
+                user_data.get('city'),
+                user_data.get('role', 'customer')
+            ))
+            row = cursor.fetchone()
+            db.commit()
+            
+            return row['user_id'] if row else None
+    
     @staticmethod
     def update(user_id, user_data):
         """Update user information"""
@@ -94,6 +211,7 @@ class User:
             sql = f"UPDATE users SET {', '.join(update_fields)} WHERE user_id = %s"
             cursor.execute(sql, tuple(values))
             db.commit()
+            User.get_by_id.invalidate(user_id)
             
             return cursor.rowcount > 0
     
@@ -105,6 +223,7 @@ class User:
             sql = "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE user_id = %s"
             cursor.execute(sql, (user_id,))
             db.commit()
+            User.get_by_id.invalidate(user_id)
             
             return cursor.rowcount > 0
     
@@ -116,6 +235,7 @@ class User:
             sql = "UPDATE users SET is_active = FALSE WHERE user_id = %s"
             cursor.execute(sql, (user_id,))
             db.commit()
+            User.get_by_id.invalidate(user_id)
             
             return cursor.rowcount > 0
     
@@ -0,0 +1,130 @@
+from database.db import get_db
+from utils.auth import generate_uuid
+from utils.cache import TTLCache, MISSING
+import psycopg2.extras
+import os
+
+# Per-user set of wishlisted product_ids, used to draw hearts on product grids
+membership_cache = TTLCache(
+    maxsize=int(os.getenv('WISHLIST_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('WISHLIST_CACHE_TTL', 300)),
+    name='wishlist_membership'
+)
+
+class Wishlist:
+    @staticmethod
+    def _get_or_create_id(cursor, user_id):
+        """Get the user's wishlist id, creating the wishlist row if needed"""
+        sql = """
+            INSERT INTO wishlist (wishlist_id, user_id) VALUES (%s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+            RETURNING wishlist_id
+        """
+        cursor.execute(sql, (generate_uuid(), user_id))
+        return cursor.fetchone()['wishlist_id']
+
+    @staticmethod
+    def get_items(user_id):
+        """Get the products in a user's wishlist"""
+        db = get_db()
+        with db.cursor() as cursor:
+            sql = """
+                SELECT wi.wishlist_item_id, wi.product_id, wi.date_added,
+                       p.name, p.price, p.sale_price, p.stock_quantity, p.is_active,
+                       p.store_id, pi.image_url
+                FROM wishlist w
+                JOIN wishlist_items wi ON wi.wishlist_id = w.wishlist_id
+                JOIN products p ON p.product_id = wi.product_id
+                LEFT JOIN product_images pi ON pi.product_id = p.product_id AND pi.is_primary = TRUE
+                WHERE w.user_id = %s
+                ORDER BY wi.date_added DESC
+            """
+            cursor.execute(sql, (user_id,))
+            return cursor.fetchall()
+
+    @staticmethod
+    def get_product_ids(user_id):
+        """Get the set of product_ids in a user's wishlist (cached per user)"""
+        product_ids = membership_cache.get(user_id)
+        if product_ids is not MISSING:
+            return product_ids
+        
+        db = get_db()
+        with db.cursor() as cursor:
+            # Served by idx_wishlist_user and idx_wishlist_items_wishlist_product
+            sql = """
+                SELECT wi.product_id
+                FROM wishlist w
+                JOIN wishlist_items wi ON wi.wishlist_id = w.wishlist_id
+                WHERE w.user_id = %s
+            """
+            cursor.execute(sql, (user_id,))
+            product_ids = frozenset(row['product_id'] for row in cursor.fetchall())
+        
+        membership_cache.set(user_id, product_ids)
+        return product_ids
+
+    @staticmethod
+    def contains(user_id, product_ids):
+        """Return which of the given product_ids are in the user's wishlist"""
+        return Wishlist.get_product_ids(user_id).intersection(product_ids)
+
+    @staticmethod
+    def add_item(user_id, product_id):
+        """Add a product to the wishlist, returns the wishlist item id"""
+        db = get_db()
+        with db.cursor() as cursor:
+            wishlist_id = Wishlist._get_or_create_id(cursor, user_id)
+            sql = """
+                INSERT INTO wishlist_items (wishlist_item_id, wishlist_id, product_id)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (wishlist_id, product_id)
+                DO UPDATE SET product_id = EXCLUDED.product_id
+                RETURNING wishlist_item_id
+            """
+            cursor.execute(sql, (generate_uuid(), wishlist_id, product_id))
+            wishlist_item_id = cursor.fetchone()['wishlist_item_id']
+            db.commit()
+            membership_cache.invalidate(user_id)
+
+            return wishlist_item_id
+
+    @staticmethod
+    def remove_item(user_id, wishlist_item_id):
+        """Remove an item from the user's wishlist"""
+        db = get_db()
+        with db.cursor() as cursor:
+            sql = """
+                DELETE FROM wishlist_items wi
+                USING wishlist w
+                WHERE wi.wishlist_id = w.wishlist_id
+                AND w.user_id = %s AND wi.wishlist_item_id = %s
+            """
+            cursor.execute(sql, (user_id, wishlist_item_id))
+            db.commit()
+            membership_cache.invalidate(user_id)
+
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def apply(user_id, add_product_ids, remove_product_ids):
+        """Add and remove several products in a single transaction"""
+        db = get_db()
+        with db.cursor() as cursor:
+            wishlist_id = Wishlist._get_or_create_id(cursor, user_id)
+
+            if remove_product_ids:
+                sql = "DELETE FROM wishlist_items WHERE wishlist_id = %s AND product_id = ANY(%s)"
+                cursor.execute(sql, (wishlist_id, list(remove_product_ids)))
+
+            if add_product_ids:
+                # Only products that exist are inserted, unknown ids are skipped
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO wishlist_items (wishlist_item_id, wishlist_id, product_id)
+                    SELECT v.wishlist_item_id, v.wishlist_id, v.product_id
+                    FROM (VALUES %s) AS v (wishlist_item_id, wishlist_id, product_id)
+                    JOIN products p ON p.product_id = v.product_id
+                    ON CONFLICT (wishlist_id, product_id) DO NOTHING
+                """, [(generate_uuid(), wishlist_id, product_id) for product_id in add_product_ids])
+            db.commit()
+            membership_cache.invalidate(user_id)
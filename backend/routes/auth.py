@@ -21,19 +21,10 @@ def register_customer():
                 'message': f'Missing required field: {field}'
             }), 400
     
-    # Check if user already exists
-    existing_user = User.get_by_email(data['email'])
-    if existing_user:
-        return jsonify({
-            'success': False,
-            'message': 'User with this email already exists'
-        }), 409
-    
     # Create user with customer role
     try:
         user_data = {
             'email': data['email'],
-            'password': data['password'],
             'first_name': data['first_name'],
             'last_name': data['last_name'],
             'phone': data.get('phone'),
@@ -42,7 +33,13 @@ def register_customer():
             'role': 'customer'
         }
         
-        user_id = User.create(user_data)
+        # A single INSERT ... ON CONFLICT both checks and creates the user
+        user_id = User.register(user_data, hash_password(data['password']))
+        if not user_id:
+            return jsonify({
+                'success': False,
+                'message': 'User with this email already exists'
+            }), 409
         
         # Generate JWT token
         access_token = create_access_token(identity=user_id)
@@ -60,6 +57,8 @@ def register_customer():
             }
         }), 201
     except Exception as e:
+        from database.db import get_db
+        get_db().rollback()
         return jsonify({
             'success': False,
             'message': 'Registration failed',
@@ -89,72 +88,55 @@ def register_supplier():
                 'message': f'Missing required field: {field}'
             }), 400
     
-    # Check if user already exists
-    existing_user = User.get_by_email(data['email'])
-    if existing_user:
-        return jsonify({
-            'success': False,
-            'message': 'User with this email already exists'
-        }), 409
-    
     try:
-        # Begin database transaction
-        from database.db import get_db
-        db = get_db()
+        user_data = {
+            'email': data['email'],
+            'first_name': data['first_name'],
+            'last_name': data['last_name'],
+            'phone': data.get('phone'),
+            'address': data.get('address'),
+            'city': data.get('city')
+        }
+        
+        supplier_data = {
+            'business_name': data['business_name'],
+            'business_address': data['business_address'],
+            'business_phone': data['business_phone'],
+            'tax_id': data.get('tax_id'),
+            'verification_documents': data.get('verification_documents')
+        }
+        
+        # User and supplier rows are created by one chained statement, so
+        # there is no partial account to roll back
+        created = Supplier.register(user_data, hash_password(data['password']), supplier_data)
+        if not created:
+            return jsonify({
+                'success': False,
+                'message': 'User with this email already exists'
+            }), 409
         
-        try:
-            # Create user with supplier role
-            user_data = {
+        user_id, supplier_id = created
+        
+        # Generate JWT token
+        access_token = create_access_token(identity=user_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Supplier account registered successfully',
+            'token': access_token,
+            'user': {
+                'user_id': user_id,
                 'email': data['email'],
-                'password': data['password'],
                 'first_name': data['first_name'],
                 'last_name': data['last_name'],
-                'phone': data.get('phone'),
-                'address': data.get('address'),
-                'city': data.get('city'),
-                'role': 'supplier'
+                'role': 'supplier',
+                'business_name': data['business_name']
             }
-            
-            user_id = User.create(user_data)
-            
-            # Create supplier record
-            supplier_data = {
-                'user_id': user_id,
-                'business_name': data['business_name'],
-                'business_address': data['business_address'],
-                'business_phone': data['business_phone'],
-                'tax_id': data.get('tax_id'),
-                'verification_documents': data.get('verification_documents')
-            }
-            
-            supplier_id = Supplier.create(supplier_data)
-            
-            # Commit transaction
-            db.commit()
-            
-            # Generate JWT token
-            access_token = create_access_token(identity=user_id)
-            
-            return jsonify({
-                'success': True,
-                'message': 'Supplier account registered successfully',
-                'token': access_token,
-                'user': {
-                    'user_id': user_id,
-                    'email': data['email'],
-                    'first_name': data['first_name'],
-                    'last_name': data['last_name'],
-                    'role': 'supplier',
-                    'business_name': data['business_name']
-                }
-            }), 201
-            
-        except Exception as e:
-            # Rollback transaction on error
-            db.rollback()
-            raise e
+        }), 201
             
     except Exception as e:
+        from database.db import get_db
+        get_db().rollback()
         return jsonify({
             'success': False,
             'message': 'Supplier registration failed',
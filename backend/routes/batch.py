@@ -0,0 +1,118 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import jwt_required
+from werkzeug.test import EnvironBuilder
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from database.db import get_db, QueryStats, SharedConnection
+import os
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_BATCH_REQUESTS = 20
+
+# Sub-requests of one batch run concurrently on this pool
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+# Headers passed on to sub-requests; everything else (notably
+# Accept-Encoding and conditional headers) is left to the batch response
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language', 'X-Request-ID')
+
+def _dispatch(app, shared, path, headers):
+    """Run one GET through the app's full request pipeline on the shared connection"""
+    parts = urlsplit(path)
+    environ = EnvironBuilder(
+        path=parts.path, query_string=parts.query, method='GET', headers=headers
+    ).get_environ()
+
+    with app.app_context():
+        # Borrowed on first use: the batch request owns the connection and
+        # closes it, sub-requests take turns on it
+        g.db_shared = shared
+        with app.request_context(environ):
+            try:
+                response = app.full_dispatch_request()
+            except Exception:
+                app.logger.exception("Batch sub-request %s failed", path)
+                return 500, {'success': False, 'message': 'Internal server error'}, None
+            stats = g.get('query_stats')
+            return response.status_code, response.get_json(silent=True), stats
+
+@batch_bp.route('', methods=['POST'])
+@jwt_required()
+def batch():
+    """Run several GET requests in one round trip
+
+    Body: {"requests": [{"id": "store", "path": "/api/stores/<id>"}, ...]}.
+    Sub-requests go through the same routing, JWT checks and hooks as
+    direct calls and run concurrently, so they must be independent reads.
+    They share this request's database connection one at a time, each in
+    its own transaction, so one failing does not affect the others. Each
+    result carries its own status; the batch itself returns 200 once it is
+    valid. Only signed-in users may batch, as the pool is process-wide.
+    """
+    data = request.get_json(silent=True) or {}
+    subrequests = data.get('requests')
+
+    if not isinstance(subrequests, list) or not subrequests:
+        return jsonify({
+            'success': False,
+            'message': 'requests must be a non-empty list'
+        }), 400
+
+    if len(subrequests) > MAX_BATCH_REQUESTS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_BATCH_REQUESTS} requests per batch'
+        }), 400
+
+    for index, sub in enumerate(subrequests):
+        path = sub.get('path') if isinstance(sub, dict) else None
+        if not isinstance(path, str) or not path.startswith('/api/') or path.startswith('/api/batch'):
+            return jsonify({
+                'success': False,
+                'message': f'Request {index}: path must be an /api/ URL other than /api/batch'
+            }), 400
+        if sub.get('method', 'GET').upper() != 'GET':
+            return jsonify({
+                'success': False,
+                'message': f'Request {index}: only GET requests can be batched'
+            }), 400
+
+    app = current_app._get_current_object()
+    shared = SharedConnection(get_db())
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    # Sub-requests log under the batch's request id
+    if g.get('request_id'):
+        headers['X-Request-ID'] = g.request_id
+
+    futures = [
+        batch_pool.submit(_dispatch, app, shared, sub['path'], headers)
+        for sub in subrequests
+    ]
+
+    responses = []
+    for index, (sub, future) in enumerate(zip(subrequests, futures)):
+        status, body, sub_stats = future.result()
+        if sub_stats is not None:
+            # Fold the sub-request's SQL into this request's Server-Timing
+            # and metrics
+            stats = g.get('query_stats')
+            if stats is None:
+                stats = g.query_stats = QueryStats()
+            stats.count += sub_stats.count
+            stats.total += sub_stats.total
+            stats.statements.update(sub_stats.statements)
+            if sub_stats.slowest > stats.slowest:
+                stats.slowest = sub_stats.slowest
+                stats.slowest_sql = sub_stats.slowest_sql
+        responses.append({
+            'id': sub.get('id', index),
+            'status': status,
+            'body': body
+        })
+
+    return jsonify({
+        'success': True,
+        'responses': responses
+    }), 200
@@ -1,24 +1,73 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-# Import models when they're available
-# from models.cart import Cart
+from models.cart import Cart, cart_store
+from models.pricing import price_lines
+import logging
 
 cart_bp = Blueprint('cart', __name__)
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_OPERATIONS = 100
+
+def _parse_quantity(value, minimum):
+    """Parse a quantity from the request body, returns None if invalid"""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= minimum else None
+
+def _cart_payload(user_id):
+    """Build the cart response body from the cart store and pricing engine"""
+    # Served from the in-memory cart store, only a cold cart touches the DB
+    items = cart_store.get_items(user_id)
+
+    # Prices come from one batched products query, not one lookup per item
+    priced = price_lines(items)
+
+    return {
+        'items': priced['items'],
+        'item_count': sum(item['quantity'] for item in items),
+        'stores': priced['stores'],
+        'total': priced['total'],
+        'loyalty_points_earned': priced['loyalty_points_earned'],
+        'warnings': priced['warnings']
+    }
+
+def _persist(user_id):
+    """Write a mutated cart back before answering, returns an error response or None
+
+    Another worker may hold its own copy of the cart, so a change is only
+    confirmed once it is stored: on a version conflict the change has been
+    dropped and the client is told to retry against the reloaded cart.
+    On a failed write the cart stays dirty and the write-back retries it.
+    """
+    try:
+        stored = cart_store.flush(user_id)
+    except Exception:
+        logger.exception("Failed to write cart for user %s", user_id)
+        return jsonify({
+            'success': False,
+            'message': 'Failed to update cart'
+        }), 500
+
+    if not stored:
+        return jsonify({
+            'success': False,
+            'message': 'Cart was changed by another request, please retry',
+            'cart': _cart_payload(user_id)
+        }), 409
+    return None
 
 @cart_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_cart():
     """Get user's cart"""
     user_id = get_jwt_identity()
-    
-    # Placeholder response until Cart model is implemented
+
     return jsonify({
         'success': True,
-        'message': 'Cart endpoint - Get cart',
-        'cart': {
-            'items': [],
-            'total': 0
-        }
+        'cart': _cart_payload(user_id)
     }), 200
 
 @cart_bp.route('/items', methods=['POST'])
@@ -27,21 +76,37 @@ def add_to_cart():
     """Add item to cart"""
     user_id = get_jwt_identity()
     data = request.json
-    
+
     # Validate required fields
     if 'product_id' not in data:
         return jsonify({
             'success': False,
             'message': 'Product ID is required'
         }), 400
-        
-    quantity = data.get('quantity', 1)
-    
-    # Placeholder response until Cart model is implemented
+
+    quantity = _parse_quantity(data.get('quantity', 1), 1)
+    if quantity is None:
+        return jsonify({
+            'success': False,
+            'message': 'Quantity must be a positive integer'
+        }), 400
+
+    if not Cart.product_is_available(data['product_id']):
+        return jsonify({
+            'success': False,
+            'message': 'Product not found'
+        }), 404
+
+    item = cart_store.add_item(user_id, data['product_id'], quantity)
+    error = _persist(user_id)
+    if error:
+        return error
+
     return jsonify({
         'success': True,
-        'message': 'Item added to cart successfully (placeholder)',
-        'cart_item_id': 'sample-id'
+        'message': 'Item added to cart successfully',
+        'cart_item_id': item['cart_item_id'],
+        'quantity': item['quantity']
     }), 201
 
 @cart_bp.route('/items/<item_id>', methods=['PUT'])
@@ -50,18 +115,33 @@ def update_cart_item(item_id):
     """Update cart item quantity"""
     user_id = get_jwt_identity()
     data = request.json
-    
+
     # Validate required fields
     if 'quantity' not in data:
         return jsonify({
             'success': False,
             'message': 'Quantity is required'
         }), 400
-        
-    # Placeholder response until Cart model is implemented
+
+    quantity = _parse_quantity(data['quantity'], 0)
+    if quantity is None:
+        return jsonify({
+            'success': False,
+            'message': 'Quantity must be a non-negative integer'
+        }), 400
+
+    if not cart_store.update_item(user_id, item_id, quantity):
+        return jsonify({
+            'success': False,
+            'message': 'Cart item not found'
+        }), 404
+    error = _persist(user_id)
+    if error:
+        return error
+
     return jsonify({
         'success': True,
-        'message': f'Cart item {item_id} updated successfully (placeholder)'
+        'message': f'Cart item {item_id} updated successfully'
     }), 200
 
 @cart_bp.route('/items/<item_id>', methods=['DELETE'])
@@ -69,11 +149,19 @@ def update_cart_item(item_id):
 def remove_from_cart(item_id):
     """Remove item from cart"""
     user_id = get_jwt_identity()
-    
-    # Placeholder response until Cart model is implemented
+
+    if not cart_store.remove_item(user_id, item_id):
+        return jsonify({
+            'success': False,
+            'message': 'Cart item not found'
+        }), 404
+    error = _persist(user_id)
+    if error:
+        return error
+
     return jsonify({
         'success': True,
-        'message': f'Cart item {item_id} removed successfully (placeholder)'
+        'message': f'Cart item {item_id} removed successfully'
     }), 200
 
 @cart_bp.route('/', methods=['DELETE'])
@@ -81,9 +169,81 @@ def remove_from_cart(item_id):
 def clear_cart():
     """Clear cart"""
     user_id = get_jwt_identity()
-    
-    # Placeholder response until Cart model is implemented
+
+    cart_store.clear(user_id)
+    error = _persist(user_id)
+    if error:
+        return error
+
     return jsonify({
         'success': True,
-        'message': 'Cart cleared successfully (placeholder)'
-    }), 200
\ No newline at end of file
+        'message': 'Cart cleared successfully'
+    }), 200
+
+def _parse_operation(operation):
+    """Validate one batch operation, returns a normalised copy or None"""
+    if not isinstance(operation, dict):
+        return None
+    op = operation.get('op')
+    if op == 'add' and operation.get('product_id'):
+        quantity = _parse_quantity(operation.get('quantity', 1), 1)
+        if quantity is not None:
+            return {'op': op, 'product_id': operation['product_id'], 'quantity': quantity}
+    elif op == 'update' and operation.get('cart_item_id'):
+        quantity = _parse_quantity(operation.get('quantity'), 0)
+        if quantity is not None:
+            return {'op': op, 'cart_item_id': operation['cart_item_id'], 'quantity': quantity}
+    elif op == 'remove' and operation.get('cart_item_id'):
+        return {'op': op, 'cart_item_id': operation['cart_item_id']}
+    elif op == 'clear':
+        return {'op': op}
+    return None
+
+@cart_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_update_cart():
+    """Apply several cart operations in one request (e.g. restoring a guest cart)"""
+    user_id = get_jwt_identity()
+    data = request.json or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({
+            'success': False,
+            'message': 'A non-empty list of operations is required'
+        }), 400
+
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch'
+        }), 400
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        operation = _parse_operation(operation)
+        if operation is None:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid operation at index {index}'
+            }), 400
+        parsed.append(operation)
+
+    # Check every product being added with a single query
+    requested = {op['product_id'] for op in parsed if op['op'] == 'add'}
+    available = Cart.available_products(requested)
+    skipped = sorted(requested - available)
+    parsed = [op for op in parsed if op['op'] != 'add' or op['product_id'] in available]
+
+    cart_store.apply(user_id, parsed)
+    # The whole batch is persisted as one execute_values transaction
+    error = _persist(user_id)
+    if error:
+        return error
+
+    return jsonify({
+        'success': True,
+        'message': 'Cart updated successfully',
+        'skipped_products': skipped,
+        'cart': _cart_payload(user_id)
+    }), 200
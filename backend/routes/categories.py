@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from models.category import Category
+
+categories_bp = Blueprint('categories', __name__)
+
+# Unversioned requests may be reused for a few minutes; requests that carry
+# the current ?v=<version> can never change and are cached for a year
+CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=86400'
+CACHE_CONTROL_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+@categories_bp.route('', methods=['GET'])
+def get_categories():
+    """Get all categories from the in-process snapshot"""
+    snapshot = Category.snapshot()
+
+    response = jsonify({
+        'success': True,
+        'categories': snapshot.categories,
+        'version': snapshot.version
+    })
+    # Strong, content-versioned ETag: revalidation is answered with a 304
+    # without touching the database
+    response.set_etag(f'categories-{snapshot.version}')
+    if request.args.get('v') == snapshot.version:
+        response.headers['Cache-Control'] = CACHE_CONTROL_IMMUTABLE
+    else:
+        response.headers['Cache-Control'] = CACHE_CONTROL
+    return response, 200
@@ -1,8 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.auth import role_required
-# Import models when they're available
-# from models.loyalty import LoyaltyPoints
+from models.loyalty import LoyaltyPoints
 
 loyalty_bp = Blueprint('loyalty', __name__)
 
@@ -14,16 +13,16 @@ def get_loyalty_transactions():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
     
-    # Placeholder response until LoyaltyPoints model is implemented
+    transactions, total = LoyaltyPoints.get_transactions(user_id, page, limit)
+    
     return jsonify({
         'success': True,
-        'message': 'Loyalty transactions endpoint',
-        'transactions': [],
+        'transactions': transactions,
         'pagination': {
-            'total': 0,
+            'total': total,
             'page': page,
             'limit': limit,
-            'pages': 0
+            'pages': (total + limit - 1) // limit
         }
     }), 200
 
@@ -40,14 +39,32 @@ def redeem_loyalty_points():
             'success': False,
             'message': 'Points to redeem are required'
         }), 400
-        
-    # Placeholder response until LoyaltyPoints model is implemented
+    
+    try:
+        points = int(data['points'])
+    except (TypeError, ValueError):
+        points = 0
+    if points <= 0:
+        return jsonify({
+            'success': False,
+            'message': 'Points must be a positive integer'
+        }), 400
+    
+    redeemed = LoyaltyPoints.redeem(user_id, points, data.get('description'))
+    if not redeemed:
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient loyalty points'
+        }), 409
+    
+    transaction_id, remaining = redeemed
+    
     return jsonify({
         'success': True,
-        'message': 'Loyalty points redeemed successfully (placeholder)',
-        'transaction_id': 'sample-id',
-        'points_redeemed': data['points'],
-        'remaining_points': 100  # Placeholder value
+        'message': 'Loyalty points redeemed successfully',
+        'transaction_id': transaction_id,
+        'points_redeemed': points,
+        'remaining_points': remaining
     }), 200
 
 @loyalty_bp.route('/summary', methods=['GET'])
@@ -56,14 +73,9 @@ def get_loyalty_summary():
     """Get loyalty points summary for the current user"""
     user_id = get_jwt_identity()
     
-    # Placeholder response until LoyaltyPoints model is implemented
+    # A single-row read of the running balances, independent of history length
     return jsonify({
         'success': True,
         'message': 'Loyalty points summary',
-        'points': {
-            'total': 100,  # Placeholder value
-            'redeemable': 100,  # Placeholder value
-            'pending': 0,  # Placeholder value
-            'expired': 0  # Placeholder value
-        }
-    }), 200
\ No newline at end of file
+        'points': LoyaltyPoints.get_summary(user_id)
+    }), 200
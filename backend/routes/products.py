@@ -2,15 +2,44 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from werkzeug.utils import secure_filename
 from datetime import datetime
+import logging
 import os
 import uuid
+from models.wishlist import Wishlist
+from models.category import Category
+from models.store import summary_cache
+from utils.fields import parse_fields
 
 products_bp = Blueprint('products', __name__)
+logger = logging.getLogger(__name__)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 UPLOAD_FOLDER = 'uploads/products'
 
+# Fields of product listings, selectable with ?fields=, and their SQL
+LIST_FIELDS = {
+    'product_id': 'p.product_id',
+    'store_id': 'p.store_id',
+    'category_id': 'p.category_id',
+    'name': 'p.name',
+    'description': 'p.description',
+    'price': 'p.price',
+    'sale_price': 'p.sale_price',
+    'stock_quantity': 'p.stock_quantity',
+    'is_featured': 'p.is_featured',
+    'is_active': 'p.is_active',
+    'date_created': 'p.date_created',
+    'date_updated': 'p.date_updated',
+    'avg_rating': 'p.avg_rating',
+    'loyalty_points_earned': 'p.loyalty_points_earned',
+    'store_name': 's.name AS store_name',
+    'store_city': 's.city AS store_city',
+    'image_url': 'pi.image_url',
+    # Resolved from the category snapshot, not joined
+    'category_name': None
+}
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -20,12 +49,10 @@ def allowed_file(filename):
 def add_product():
     """Add a new product"""
     try:
-        # Debug: Check JWT token
         try:
             user_id = get_jwt_identity()
-            print(f"JWT User ID: {user_id}")
-        except Exception as jwt_error:
-            print(f"JWT Error: {jwt_error}")
+        except Exception:
+            logger.warning("Could not read JWT identity", exc_info=True)
             return jsonify({
                 'success': False,
                 'message': 'Invalid or expired token'
@@ -40,8 +67,6 @@ def add_product():
             cursor.execute(sql, (user_id,))
             user = cursor.fetchone()
             
-            print(f"User found: {user}")
-            
             if not user:
                 return jsonify({
                     'success': False,
@@ -59,8 +84,6 @@ def add_product():
             cursor.execute(sql, (user_id,))
             store = cursor.fetchone()
             
-            print(f"Store found: {store}")
-            
             if not store:
                 return jsonify({
                     'success': False,
@@ -78,8 +101,6 @@ def add_product():
         is_active = request.form.get('is_active', 'true').lower() == 'true'
         loyalty_points_earned = request.form.get('loyalty_points_earned', '0')
 
-        print(f"Form data received: name={name}, price={price}, category={category_id}, stock={stock_quantity}")
-
         # Validate required fields
         if not all([name, description, price, category_id, stock_quantity]):
             missing_fields = []
@@ -150,7 +171,6 @@ def add_product():
                 file_path = os.path.join(UPLOAD_FOLDER, image_filename)
                 file.save(file_path)
                 image_url = f"/uploads/products/{image_filename}"
-                print(f"Image saved: {image_url}")
 
         # Generate product ID
         product_id = str(uuid.uuid4())
@@ -180,7 +200,10 @@ def add_product():
                 """
                 cursor.execute(sql, (image_id, product_id, image_url, True, 0))
 
-        print(f"Product created successfully: {product_id}")
+        # The supplier's dashboard counts products
+        summary_cache.invalidate(user_id)
+
+        logger.info("Product created", extra={'product_id': product_id, 'store_id': store['store_id']})
 
         return jsonify({
             'success': True,
@@ -188,10 +211,8 @@ def add_product():
             'product_id': product_id
         }), 201
 
-    except Exception as e:
-        print(f"Error adding product: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error adding product")
         return jsonify({
             'success': False,
             'message': 'An error occurred while adding the product'
@@ -200,25 +221,45 @@ def add_product():
 @products_bp.route('/products', methods=['GET'])  # Changed route
 def get_products():
     """Get all products with filters"""
+    # Checked outside the try below, so an expired or malformed token gets
+    # flask_jwt_extended's 401 instead of a 500
+    with_wishlist = request.args.get('in_wishlist', 'false').lower() == 'true'
+    if with_wishlist:
+        verify_jwt_in_request(optional=True)
+
     try:
         store_id = request.args.get('store_id')
         category_id = request.args.get('category_id')
         search = request.args.get('search')
         is_featured = request.args.get('is_featured')
         
+        fields, unknown = parse_fields(request.args.get('fields'), LIST_FIELDS, always=('product_id',))
+        if unknown:
+            return jsonify({
+                'success': False,
+                'message': f'Unknown fields: {", ".join(unknown)}. Allowed: {", ".join(LIST_FIELDS)}'
+            }), 400
+        fields = fields or tuple(LIST_FIELDS)
+        
         from database.db import get_cursor
         
+        # category_name is looked up by category_id after the query
+        with_category = 'category_name' in fields
+        columns = [LIST_FIELDS[field] for field in fields if LIST_FIELDS[field]]
+        if with_category and 'category_id' not in fields:
+            columns.append(LIST_FIELDS['category_id'])
+        
         with get_cursor() as cursor:
-            # Build query based on filters
-            sql = """
-                SELECT p.*, s.name as store_name, s.city as store_city,
-                       pi.image_url, c.name as category_name
+            # Build query based on filters; the image join is only made
+            # when its column is requested
+            sql = f"""
+                SELECT {', '.join(columns)}
                 FROM products p
                 JOIN stores s ON p.store_id = s.store_id
-                LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = TRUE
-                WHERE p.is_active = TRUE AND s.is_active = TRUE
             """
+            if 'image_url' in fields:
+                sql += " LEFT JOIN product_images pi ON p.product_id = pi.product_id AND pi.is_primary = TRUE"
+            sql += " WHERE p.is_active = TRUE AND s.is_active = TRUE"
             params = []
             
             if store_id:
@@ -242,13 +283,29 @@ def get_products():
             cursor.execute(sql, params)
             products = cursor.fetchall()
 
+        if with_category:
+            names = Category.names()
+            for product in products:
+                if 'category_id' in fields:
+                    product['category_name'] = names.get(product['category_id'])
+                else:
+                    product['category_name'] = names.get(product.pop('category_id'))
+
+        # Opt-in heart flags for signed-in users, answered from the cached
+        # wishlist set instead of a query per product
+        if with_wishlist:
+            user_id = get_jwt_identity()
+            wishlisted = Wishlist.get_product_ids(user_id) if user_id else frozenset()
+            for product in products:
+                product['in_wishlist'] = product['product_id'] in wishlisted
+
         return jsonify({
             'success': True,
             'products': products
         }), 200
 
-    except Exception as e:
-        print(f"Error fetching products: {e}")
+    except Exception:
+        logger.exception("Error fetching products")
         return jsonify({
             'success': False,
             'message': 'An error occurred while fetching products'
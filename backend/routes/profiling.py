@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required
+from utils.auth import role_required
+from utils.profiler import profiler
+import math
+
+profiling_bp = Blueprint('profiling', __name__)
+
+# Under gunicorn, start/stop/reset reach every worker through the shared
+# PROFILER_DIR (within PROFILER_SYNC_INTERVAL), and results sum all of them
+
+@profiling_bp.route('/', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_profiling_status():
+    """Get the profiler state and sample counts per route (admin only)"""
+    return jsonify({
+        'success': True,
+        'profiling': profiler.status()
+    }), 200
+
+@profiling_bp.route('/start', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def start_profiling():
+    """Start sampling a percentage of requests (admin only)"""
+    data = request.json or {}
+
+    try:
+        percent = float(data.get('percent', 1))
+        interval_ms = float(data.get('interval_ms', 5))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'percent and interval_ms must be numbers'
+        }), 400
+
+    # float() accepts 'nan' and 'inf', which would break the sampling loop
+    if not (math.isfinite(percent) and math.isfinite(interval_ms)):
+        return jsonify({
+            'success': False,
+            'message': 'percent and interval_ms must be finite numbers'
+        }), 400
+
+    profiler.start(rate=percent / 100, interval=interval_ms / 1000)
+
+    return jsonify({
+        'success': True,
+        'message': 'Profiling started',
+        'profiling': profiler.status()
+    }), 200
+
+@profiling_bp.route('/stop', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def stop_profiling():
+    """Stop sampling (admin only)"""
+    profiler.stop()
+
+    return jsonify({
+        'success': True,
+        'message': 'Profiling stopped'
+    }), 200
+
+@profiling_bp.route('/stacks', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_profiling_stacks():
+    """Download collapsed stacks for flamegraph.pl / speedscope (admin only)"""
+    return Response(
+        profiler.collapsed(request.args.get('route')),
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=profile.folded'}
+    )
+
+@profiling_bp.route('/', methods=['DELETE'])
+@jwt_required()
+@role_required('admin')
+def reset_profiling():
+    """Discard collected samples (admin only)"""
+    profiler.reset()
+
+    return jsonify({
+        'success': True,
+        'message': 'Profiling samples cleared'
+    }), 200
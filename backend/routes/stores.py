@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.store import Store
+from models.store import Store, LIST_COLUMNS
 from models.user import User
 from utils.auth import role_required
+from utils.fields import parse_fields
 
 stores_bp = Blueprint('stores', __name__)
 
@@ -12,7 +13,14 @@ def get_stores():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
     
-    stores, total = Store.get_all(page, limit)
+    fields, unknown = parse_fields(request.args.get('fields'), LIST_COLUMNS, always=('store_id',))
+    if unknown:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown fields: {", ".join(unknown)}. Allowed: {", ".join(LIST_COLUMNS)}'
+        }), 400
+    
+    stores, total = Store.get_all(page, limit, fields)
     
     return jsonify({
         'success': True,
@@ -53,6 +61,20 @@ def get_my_stores():
         'stores': stores
     }), 200
 
+@stores_bp.route('/my-stores/summary', methods=['GET'])
+@jwt_required()
+@role_required('supplier', 'admin')
+def get_my_stores_summary():
+    """Get the supplier dashboard: stores, product counts, low stock, pending orders, reviews"""
+    user_id = get_jwt_identity()
+    
+    summary = Store.get_owner_summary(user_id)
+    
+    return jsonify({
+        'success': True,
+        'summary': summary
+    }), 200
+
 @stores_bp.route('/', methods=['POST'])
 @jwt_required()
 @role_required('supplier', 'admin')
@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.user import User
+from models.user import User, LIST_COLUMNS
 from utils.auth import role_required
+from utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
+import uuid
+import csv
+import io
 
 users_bp = Blueprint('users', __name__)
 
+MAX_PAGE_SIZE = 200
+EXPORT_CHUNK_ROWS = 1000
+USER_ROLES = ('customer', 'supplier', 'admin')
+
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
@@ -82,26 +91,102 @@ def deactivate_account():
     }), 200
 
 # Admin routes
+def _admin_user_filters():
+    """Read the role/city/is_active filters from the query string, returns None for an unknown role"""
+    role = request.args.get('role')
+    if role is not None and role not in USER_ROLES:
+        # Checked here so an unknown role is a 400, not a DataError from the enum cast
+        return None
+    is_active = request.args.get('is_active')
+    return {
+        'role': role,
+        'city': request.args.get('city'),
+        'is_active': None if is_active is None else is_active.lower() == 'true'
+    }
+
+def _parse_user_cursor(cursor):
+    """Decode a (date_joined, user_id) cursor, returns None unless both values are valid"""
+    values = decode_cursor(cursor)
+    if not values or len(values) != 2:
+        return None
+    date_joined, user_id = values
+    try:
+        # Checked here so a tampered cursor is a 400, not a DataError from Postgres
+        date_joined = datetime.fromisoformat(date_joined)
+        uuid.UUID(user_id)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return [date_joined, user_id]
+
 @users_bp.route('/', methods=['GET'])
 @jwt_required()
 @role_required('admin')
 def get_all_users():
     """Get all users (admin only)"""
-    # Implement pagination
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 10, type=int)
+    # Keyset pagination: pass the returned next_cursor as ?after= for the next page
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE)
+    
+    after = None
+    if request.args.get('after'):
+        after = _parse_user_cursor(request.args['after'])
+        if after is None:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid pagination cursor'
+            }), 400
+    
+    filters = _admin_user_filters()
+    if filters is None:
+        return jsonify({
+            'success': False,
+            'message': f"role must be one of: {', '.join(USER_ROLES)}"
+        }), 400
     
-    # TODO: Implement get_all method in User model
-    # users, total = User.get_all(page, limit)
+    users, has_more = User.get_all(limit, after, filters)
+    
+    next_cursor = None
+    if has_more and users:
+        next_cursor = encode_cursor(users[-1]['date_joined'], users[-1]['user_id'])
     
     return jsonify({
         'success': True,
-        'message': 'Admin only endpoint - Get all users'
-        # 'users': users,
-        # 'pagination': {
-        #     'total': total,
-        #     'page': page,
-        #     'limit': limit,
-        #     'pages': (total + limit - 1) // limit
-        # }
-    }), 200
\ No newline at end of file
+        'users': users,
+        'pagination': {
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }
+    }), 200
+
+@users_bp.route('/export', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def export_users():
+    """Stream all users as CSV (admin only)"""
+    filters = _admin_user_filters()
+    if filters is None:
+        return jsonify({
+            'success': False,
+            'message': f"role must be one of: {', '.join(USER_ROLES)}"
+        }), 400
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(LIST_COLUMNS)
+        
+        for i, row in enumerate(User.iter_all(filters), 1):
+            writer.writerow(row)
+            # Flush in chunks rather than per row to keep syscalls down
+            if i % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=users.csv'}
+    )
@@ -1,44 +1,76 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-# Import models when they're available
-# from models.wishlist import Wishlist
+from models.wishlist import Wishlist
 
 wishlist_bp = Blueprint('wishlist', __name__)
 
+MAX_BATCH_OPERATIONS = 100
+MAX_MEMBERSHIP_IDS = 200
+
 @wishlist_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_wishlist():
     """Get user's wishlist"""
     user_id = get_jwt_identity()
-    
-    # Placeholder response until Wishlist model is implemented
+
     return jsonify({
         'success': True,
-        'message': 'Wishlist endpoint - Get wishlist',
         'wishlist': {
-            'items': []
+            'items': Wishlist.get_items(user_id)
         }
     }), 200
 
+@wishlist_bp.route('/contains', methods=['GET'])
+@jwt_required()
+def wishlist_contains():
+    """Report which of a page of products are in the user's wishlist"""
+    user_id = get_jwt_identity()
+    product_ids = [p for p in request.args.get('product_ids', '').split(',') if p]
+
+    if not product_ids:
+        return jsonify({
+            'success': False,
+            'message': 'product_ids is required'
+        }), 400
+
+    if len(product_ids) > MAX_MEMBERSHIP_IDS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_MEMBERSHIP_IDS} product_ids are allowed'
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'product_ids': sorted(Wishlist.contains(user_id, product_ids))
+    }), 200
+
 @wishlist_bp.route('/items', methods=['POST'])
 @jwt_required()
 def add_to_wishlist():
     """Add item to wishlist"""
     user_id = get_jwt_identity()
     data = request.json
-    
+
     # Validate required fields
     if 'product_id' not in data:
         return jsonify({
             'success': False,
             'message': 'Product ID is required'
         }), 400
-        
-    # Placeholder response until Wishlist model is implemented
+
+    try:
+        wishlist_item_id = Wishlist.add_item(user_id, data['product_id'])
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to add item to wishlist',
+            'error': str(e)
+        }), 500
+
     return jsonify({
         'success': True,
-        'message': 'Item added to wishlist successfully (placeholder)',
-        'wishlist_item_id': 'sample-id'
+        'message': 'Item added to wishlist successfully',
+        'wishlist_item_id': wishlist_item_id
     }), 201
 
 @wishlist_bp.route('/items/<item_id>', methods=['DELETE'])
@@ -46,9 +78,66 @@ def add_to_wishlist():
 def remove_from_wishlist(item_id):
     """Remove item from wishlist"""
     user_id = get_jwt_identity()
-    
-    # Placeholder response until Wishlist model is implemented
+
+    if not Wishlist.remove_item(user_id, item_id):
+        return jsonify({
+            'success': False,
+            'message': 'Wishlist item not found'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'message': f'Wishlist item {item_id} removed successfully'
+    }), 200
+
+@wishlist_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_update_wishlist():
+    """Apply several add/remove operations in one request and transaction"""
+    user_id = get_jwt_identity()
+    data = request.json or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({
+            'success': False,
+            'message': 'A non-empty list of operations is required'
+        }), 400
+
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch'
+        }), 400
+
+    # Collapse to the last operation per product so the order of the list
+    # is respected while each product is written at most once
+    final = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in ('add', 'remove') \
+                or not operation.get('product_id'):
+            return jsonify({
+                'success': False,
+                'message': f'Invalid operation at index {index}'
+            }), 400
+        final[operation['product_id']] = operation['op']
+
+    adds = [product_id for product_id, op in final.items() if op == 'add']
+    removes = [product_id for product_id, op in final.items() if op == 'remove']
+
+    try:
+        Wishlist.apply(user_id, adds, removes)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to update wishlist',
+            'error': str(e)
+        }), 500
+
     return jsonify({
         'success': True,
-        'message': f'Wishlist item {item_id} removed successfully (placeholder)'
-    }), 200
\ No newline at end of file
+        'message': 'Wishlist updated successfully',
+        'wishlist': {
+            'items': Wishlist.get_items(user_id)
+        }
+    }), 200
@@ -0,0 +1 @@
+# This file can be empty, it's just to make the directory a proper Python package
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""Scheduled job that expires loyalty points older than the retention window.
+
+Points are consumed first-in first-out: every redemption, expiry or
+negative adjustment uses up the oldest earned points first. The points that
+can expire for a user are therefore whatever was earned before the cutoff
+minus everything consumed so far:
+
+    expirable = max(0, earned_before_cutoff - total_consumed)
+
+Users are processed in chunks. Each chunk's ledger is extracted in one
+query, the formula is evaluated for every user at once with NumPy, and the
+resulting 'expired' rows are written back with COPY together with the
+matching balance snapshot and users.loyalty_points updates. Once a chunk
+is committed, the API workers are told to evict its users from their
+user_by_id caches, which hold loyalty_points.
+
+Run from the backend directory:
+
+    python -m scripts.expire_loyalty_points --days 365
+    python -m scripts.expire_loyalty_points --days 365 --dry-run
+"""
+import argparse
+import io
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import psycopg2.extensions
+
+from database.db import connect
+from models.loyalty import BALANCE_UPSERT
+from utils.invalidation import bus
+
+def next_user_chunk(db, after, size):
+    """Get the next chunk of users with a positive balance, ordered by user_id"""
+    with db.cursor() as cursor:
+        sql = """
+            SELECT user_id FROM loyalty_balances
+            WHERE user_id > %s AND balance > 0
+            ORDER BY user_id
+            LIMIT %s
+        """
+        cursor.execute(sql, (after, size))
+        return [row['user_id'] for row in cursor.fetchall()]
+
+def extract_ledger(db, user_ids, cutoff):
+    """Extract a chunk's ledger as parallel arrays (user index, points, before cutoff)"""
+    # Lock the chunk's accounts so a concurrent redemption cannot interleave
+    # between the extract and the write-back
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM users WHERE user_id = ANY(%s) ORDER BY user_id FOR UPDATE",
+            (user_ids,)
+        )
+
+    with db.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        sql = """
+            SELECT user_id, points, date_created < %s
+            FROM loyalty_points_transactions
+            WHERE user_id = ANY(%s)
+        """
+        cursor.execute(sql, (cutoff, user_ids))
+        rows = cursor.fetchall()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+
+    ids, points, before = zip(*rows)
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+    codes = np.fromiter((index[user_id] for user_id in ids), dtype=np.int64, count=len(ids))
+    return codes, np.asarray(points, dtype=np.int64), np.asarray(before, dtype=bool)
+
+def compute_expirable(codes, points, before, n_users):
+    """FIFO expirable points per user, evaluated for the whole chunk at once"""
+    earned = points > 0
+    earned_before = np.bincount(codes, weights=points * (earned & before), minlength=n_users)
+    consumed = np.bincount(codes, weights=-points * ~earned, minlength=n_users)
+    return np.maximum(earned_before - consumed, 0).astype(np.int64)
+
+def write_expiries(db, user_ids, expirable, cutoff):
+    """COPY the expired rows into the ledger and update balances set-based
+
+    Returns the ids of the users whose points expired.
+    """
+    mask = expirable > 0
+    if not mask.any():
+        return []
+
+    now = datetime.utcnow().isoformat(sep=' ')
+    description = f"Points earned before {cutoff:%Y-%m-%d} expired"
+    expired_user_ids = np.asarray(user_ids, dtype=object)[mask].tolist()
+    buffer = io.StringIO()
+    for user_id, points in zip(expired_user_ids, expirable[mask]):
+        buffer.write(f"{uuid.uuid4()}\t{user_id}\t{-int(points)}\texpired\t{description}\t{now}\n")
+    buffer.seek(0)
+
+    with db.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS expiry_batch (
+                transaction_id VARCHAR(36),
+                user_id VARCHAR(36),
+                points INTEGER,
+                transaction_type transaction_type,
+                description TEXT,
+                date_created TIMESTAMP
+            ) ON COMMIT DELETE ROWS
+        """)
+        cursor.copy_expert(
+            "COPY expiry_batch (transaction_id, user_id, points, transaction_type, "
+            "description, date_created) FROM STDIN",
+            buffer
+        )
+        cursor.execute("""
+            INSERT INTO loyalty_points_transactions (
+                transaction_id, user_id, points, transaction_type, description, date_created
+            )
+            SELECT transaction_id, user_id, points, transaction_type, description, date_created
+            FROM expiry_batch
+        """)
+        cursor.execute(BALANCE_UPSERT.format(source='expiry_batch'))
+        cursor.execute("""
+            UPDATE users u
+            SET loyalty_points = COALESCE(u.loyalty_points, 0) + e.points
+            FROM expiry_batch e
+            WHERE u.user_id = e.user_id
+        """)
+
+    return expired_user_ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=365,
+                        help='points earned more than this many days ago expire')
+    parser.add_argument('--chunk-users', type=int, default=50000)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='compute expiries but roll back instead of committing')
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    db = connect()
+    started = time.perf_counter()
+    scanned = users_expired = points_expired = 0
+    last_user = ''
+
+    try:
+        while True:
+            user_ids = next_user_chunk(db, last_user, args.chunk_users)
+            if not user_ids:
+                break
+            last_user = user_ids[-1]
+
+            codes, points, before = extract_ledger(db, user_ids, cutoff)
+            expirable = compute_expirable(codes, points, before, len(user_ids))
+            expired_user_ids = write_expiries(db, user_ids, expirable, cutoff)
+            users_expired += len(expired_user_ids)
+            points_expired += int(expirable.sum())
+            scanned += len(points)
+
+            if args.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+                # Only after the commit, so no worker can reload the old balance
+                bus.publish_many('user_by_id', expired_user_ids)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {scanned} ledger rows, expired {points_expired} points "
+          f"for {users_expired} users in {elapsed:.2f}s")
+    if scanned:
+        print(f"{elapsed / scanned * 1000000:.2f}s per million transactions")
+
+if __name__ == '__main__':
+    main()
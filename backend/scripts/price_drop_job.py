@@ -0,0 +1,36 @@
+"""Periodic job that turns logged price drops into wishlist notifications.
+
+Run from the backend directory:
+
+    python -m scripts.price_drop_job              # process once and exit
+    python -m scripts.price_drop_job --interval 60
+"""
+import argparse
+import time
+
+from database.db import connect
+from models.price_drop import PriceDrop
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--interval', type=float, default=0,
+                        help='seconds between runs (0 runs once)')
+    args = parser.parse_args()
+
+    db = connect()
+    try:
+        while True:
+            started = time.perf_counter()
+            changes, notifications = PriceDrop.process_pending(db, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"Processed {changes} price changes, queued {notifications} "
+                  f"notifications in {elapsed:.2f}s")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Verify the loyalty balance snapshots and users.loyalty_points against the ledger.
+
+Run from the backend directory:
+
+    python -m scripts.reconcile_loyalty         # report mismatches
+    python -m scripts.reconcile_loyalty --fix   # rewrite them from the ledger
+
+Exits with status 1 when mismatches were found (and not fixed), so it can
+run from cron or CI.
+"""
+import argparse
+import sys
+
+from database.db import connect
+from models.loyalty import LoyaltyPoints
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fix', action='store_true',
+                        help='rewrite mismatching snapshots and account balances from the ledger')
+    parser.add_argument('--show', type=int, default=20,
+                        help='number of mismatches to print')
+    args = parser.parse_args()
+
+    db = connect()
+    try:
+        mismatches = LoyaltyPoints.reconcile(db, fix=args.fix)
+    finally:
+        db.close()
+
+    for row in mismatches[:args.show]:
+        print(f"{row['user_id']}: snapshot balance={row['snapshot_balance']} "
+              f"account balance={row['account_balance']} "
+              f"ledger balance={row['ledger_balance']} "
+              f"(earned {row['snapshot_earned']} vs {row['ledger_earned']})")
+
+    action = 'fixed' if args.fix else 'found'
+    print(f"{len(mismatches)} mismatching balances {action}")
+
+    if mismatches and not args.fix:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
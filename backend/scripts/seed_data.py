@@ -0,0 +1,531 @@
+"""Deterministic high-volume seed data for every table in schema.sql.
+
+Row attributes are generated column-wise with NumPy and streamed into
+Postgres with COPY from a pool of worker processes, each on its own
+connection. Popularity is skewed: which products get ordered, reviewed and
+wishlisted, which stores get reviews and which customers order most all
+follow a Zipf distribution, so hot rows and long tails look like real
+traffic.
+
+Output depends only on --seed and the table sizes, not on --jobs: every
+chunk draws from its own generator keyed by (seed, table, chunk number),
+and ids are derived from (kind, index) with seed_id(), so other tools can
+address any seeded row without a lookup.
+
+Load into a freshly created schema (schema.sql already inserts the
+categories). Run from the backend directory:
+
+    python -m scripts.seed_data --customers 1000000 --products 2000000 --orders 10000000 --yes
+    python -m scripts.seed_data --scale 0.01 --yes      # small local dataset
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import time
+
+import bcrypt
+import numpy as np
+
+from database.db import connect
+from models.loyalty import BALANCE_UPSERT
+
+PASSWORD = 'seed-password'
+CATEGORIES = [f'cat{i}' for i in range(1, 12)]
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Rawalpindi', 'Faisalabad', 'Multan', 'Peshawar']
+WORDS = ['chocolate', 'vanilla', 'red velvet', 'lemon', 'caramel', 'strawberry',
+         'almond', 'pistachio', 'coffee', 'coconut', 'cinnamon', 'blueberry']
+KINDS = ['cake', 'cupcake', 'pastry', 'cookie', 'brownie', 'tart', 'pie', 'donut',
+         'bread', 'custom cake', 'seasonal box']
+COMMENTS = ['Absolutely delicious', 'Fresh and tasty', 'Good value', 'Arrived late',
+            'Would order again', 'A bit too sweet', 'Perfect for birthdays', None]
+STATUSES = np.array(['pending', 'processing', 'shipped', 'delivered', 'cancelled'])
+STATUS_WEIGHTS = [0.03, 0.03, 0.04, 0.85, 0.05]
+PAYMENT_METHODS = np.array(['card', 'cash_on_delivery', 'wallet'])
+RATING_WEIGHTS = [0.04, 0.06, 0.15, 0.35, 0.40]
+
+# Id prefixes per row kind; seed_id('product', 7) is always the same id
+KIND_CODES = {
+    'user': 1, 'supplier': 2, 'store': 3, 'product': 4, 'image': 5, 'order': 6,
+    'order_item': 7, 'review': 8, 'store_review': 9, 'loyalty': 10, 'cart': 11,
+    'cart_item': 12, 'wishlist': 13, 'wishlist_item': 14
+}
+
+NULL = '\\N'
+EPOCH = np.datetime64('2023-01-01T00:00:00', 's')
+SPAN_SECONDS = 3 * 365 * 86400
+
+def seed_id(kind, index):
+    """Deterministic UUID-shaped id of the index-th row of a kind"""
+    return f'{KIND_CODES[kind]:08x}-0000-4000-8000-{index:012x}'
+
+def seed_ids(kind, indices):
+    """seed_id() for an array of indices"""
+    prefix = f'{KIND_CODES[kind]:08x}-0000-4000-8000-'
+    return [f'{prefix}{i:012x}' for i in np.asarray(indices).tolist()]
+
+def seed_email(index):
+    return f'user{index}@seed.invalid'
+
+class ZipfSampler:
+    """Draws indices in [0, n) with P(rank k) proportional to 1 / k**s
+
+    Ranks are assigned to indices by a fixed permutation, so the most
+    popular rows are scattered instead of being the lowest ids.
+    """
+
+    def __init__(self, n, s, rng):
+        weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+        self.ranks = rng.permutation(n)
+
+    def draw(self, rng, size):
+        return self.ranks[np.searchsorted(self.cdf, rng.random(size))]
+
+class Plan:
+    """Table sizes and the per-row attributes other tables must agree with
+
+    Built once in the parent process and inherited by the workers on fork.
+    """
+
+    def __init__(self, args):
+        self.seed = args.seed
+        self.stores = args.stores
+        self.customers = args.customers
+        self.products = max(args.products, args.stores)
+        self.orders = args.orders
+        self.reviews = args.reviews
+        self.store_reviews = args.store_reviews
+        self.carts = min(args.carts, args.customers)
+        self.wishlists = min(args.wishlists, args.customers)
+        self.chunk_rows = args.chunk_rows
+
+        rng = np.random.default_rng([self.seed, 0])
+        # One supplier user per store; customers follow them
+        self.users = self.stores + self.customers
+
+        # Every store gets at least one product, the rest are spread by
+        # store popularity
+        self.store_popularity = ZipfSampler(self.stores, 0.8, rng)
+        product_store = np.concatenate([
+            np.arange(self.stores),
+            self.store_popularity.draw(rng, self.products - self.stores)
+        ])
+        self.product_store = product_store.astype(np.int32)
+        self.product_category = rng.integers(0, len(CATEGORIES), self.products, dtype=np.int8)
+        self.product_price = np.round(rng.lognormal(2.7, 0.6, self.products).clip(1, 500), 2)
+        on_sale = rng.random(self.products) < 0.15
+        self.product_sale = np.where(on_sale, np.round(self.product_price * 0.8, 2), np.nan)
+        self.product_points = (self.product_price // 5).astype(np.int32)
+
+        # Products grouped by store, to pick further items from the same store
+        self.products_by_store = np.argsort(self.product_store, kind='stable').astype(np.int32)
+        counts = np.bincount(self.product_store, minlength=self.stores)
+        self.store_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        self.product_popularity = ZipfSampler(self.products, 1.05, rng)
+        self.customer_activity = ZipfSampler(self.customers, 0.7, rng)
+
+    def effective_price(self, products):
+        sale = self.product_sale[products]
+        price = self.product_price[products]
+        return np.where(np.isnan(sale), price, np.minimum(sale, price))
+
+    def chunks(self, table, total):
+        return [(table, number, lo, min(lo + self.chunk_rows, total))
+                for number, lo in enumerate(range(0, total, self.chunk_rows))]
+
+def timestamps(rng, size, start=EPOCH, span=SPAN_SECONDS):
+    return (start + rng.integers(0, span, size).astype('timedelta64[s]')).astype(str).tolist()
+
+def money(values):
+    return np.round(values, 2).astype(str).tolist()
+
+def nullable(values, mask):
+    """String column with NULL where mask is False"""
+    return np.where(mask, np.asarray(values, dtype=object), NULL).tolist()
+
+def copy_columns(db, table, columns, values):
+    """COPY parallel column lists into a table"""
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(row) + '\n' for row in zip(*values))
+    buffer.seek(0)
+    with db.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer, size=1 << 18)
+
+def _text(values):
+    """Strings safe for COPY text format (our vocabularies have no tabs or backslashes)"""
+    return [NULL if v is None else v for v in values]
+
+# Chunk generators. Each one gets its own RNG and writes rows [lo, hi) of
+# its table (plus any child rows owned by them) on the given connection.
+
+def gen_users(plan, rng, db, lo, hi):
+    index = np.arange(lo, hi)
+    is_supplier = index < plan.stores
+    copy_columns(db, 'users', (
+        'user_id', 'email', 'password_hash', 'first_name', 'last_name', 'phone',
+        'address', 'city', 'role', 'date_joined', 'last_login'
+    ), (
+        seed_ids('user', index),
+        [seed_email(i) for i in index.tolist()],
+        [plan.password_hash] * len(index),
+        ['Seed'] * len(index),
+        [f'User{i}' for i in index.tolist()],
+        [f'0300{i:07d}' for i in index.tolist()],
+        [f'{i} Main Boulevard' for i in index.tolist()],
+        np.asarray(CITIES)[rng.integers(0, len(CITIES), len(index))].tolist(),
+        np.where(is_supplier, 'supplier', 'customer').tolist(),
+        timestamps(rng, len(index)),
+        nullable(timestamps(rng, len(index)), rng.random(len(index)) < 0.7)
+    ))
+
+def gen_suppliers_and_stores(plan, rng, db, lo, hi):
+    index = np.arange(lo, hi)
+    n = len(index)
+    owners = seed_ids('user', index)
+    names = [f'{WORDS[w].title()} Bakery {i}'
+             for w, i in zip(rng.integers(0, len(WORDS), n).tolist(), index.tolist())]
+    cities = np.asarray(CITIES)[rng.integers(0, len(CITIES), n)].tolist()
+    phones = [f'0300{i:07d}' for i in index.tolist()]
+    addresses = [f'{i} Baker Street' for i in index.tolist()]
+    created = timestamps(rng, n)
+
+    copy_columns(db, 'suppliers', (
+        'supplier_id', 'user_id', 'business_name', 'business_address', 'business_phone',
+        'tax_id', 'is_verified', 'verification_documents', 'date_registered'
+    ), (
+        seed_ids('supplier', index), owners, names, addresses, phones,
+        [f'NTN-{i:08d}' for i in index.tolist()],
+        np.where(rng.random(n) < 0.9, 't', 'f').tolist(),
+        ['[]'] * n,
+        created
+    ))
+    copy_columns(db, 'stores', (
+        'store_id', 'owner_id', 'name', 'description', 'address', 'city', 'phone',
+        'email', 'logo_url', 'hero_image_url', 'opening_hours', 'is_active', 'date_created'
+    ), (
+        seed_ids('store', index), owners, names,
+        [f'Home-baked treats in {c}' for c in cities],
+        addresses, cities, phones,
+        [seed_email(i) for i in index.tolist()],
+        [f'/uploads/stores/{i}/logo.jpg' for i in index.tolist()],
+        [f'/uploads/stores/{i}/hero.jpg' for i in index.tolist()],
+        ['{"mon-sat": "09:00-21:00", "sun": "closed"}'] * n,
+        np.where(rng.random(n) < 0.97, 't', 'f').tolist(),
+        created
+    ))
+
+def gen_products(plan, rng, db, lo, hi):
+    index = np.arange(lo, hi)
+    n = len(index)
+    category = plan.product_category[lo:hi]
+    kinds = np.asarray(KINDS)[category].tolist()
+    flavours = np.asarray(WORDS)[rng.integers(0, len(WORDS), n)].tolist()
+    sale = plan.product_sale[lo:hi]
+    created = timestamps(rng, n)
+
+    copy_columns(db, 'products', (
+        'product_id', 'store_id', 'category_id', 'name', 'description', 'price',
+        'sale_price', 'stock_quantity', 'is_featured', 'is_active', 'date_created',
+        'date_updated', 'loyalty_points_earned'
+    ), (
+        seed_ids('product', index),
+        seed_ids('store', plan.product_store[lo:hi]),
+        np.asarray(CATEGORIES)[category].tolist(),
+        [f'{f.title()} {k} {i}' for f, k, i in zip(flavours, kinds, index.tolist())],
+        [f'Freshly baked {f} {k}' for f, k in zip(flavours, kinds)],
+        money(plan.product_price[lo:hi]),
+        nullable(money(np.nan_to_num(sale)), ~np.isnan(sale)),
+        rng.integers(0, 200, n).astype(str).tolist(),
+        np.where(rng.random(n) < 0.05, 't', 'f').tolist(),
+        np.where(rng.random(n) < 0.98, 't', 'f').tolist(),
+        created, created,
+        plan.product_points[lo:hi].astype(str).tolist()
+    ))
+
+    # One to three images per product, the first one primary
+    per_product = rng.integers(1, 4, n)
+    owner = np.repeat(index, per_product)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(per_product) - per_product, per_product)
+    copy_columns(db, 'product_images', (
+        'image_id', 'product_id', 'image_url', 'is_primary', 'display_order'
+    ), (
+        seed_ids('image', owner * 4 + position),
+        seed_ids('product', owner),
+        [f'/uploads/products/{p}/{d}.jpg' for p, d in zip(owner.tolist(), position.tolist())],
+        np.where(position == 0, 't', 'f').tolist(),
+        position.astype(str).tolist()
+    ))
+
+def gen_orders(plan, rng, db, lo, hi):
+    """Orders with their items and the loyalty points earned on delivery"""
+    index = np.arange(lo, hi)
+    n = len(index)
+    customer = plan.stores + plan.customer_activity.draw(rng, n)
+
+    # The first item is drawn by product popularity and fixes the store;
+    # further items come from the same store
+    first = plan.product_popularity.draw(rng, n)
+    store = plan.product_store[first]
+    per_order = rng.integers(1, 5, n)
+    order_of_item = np.repeat(np.arange(n), per_order)
+    is_first = np.zeros(len(order_of_item), dtype=bool)
+    is_first[np.cumsum(per_order) - per_order] = True
+    item_store = store[order_of_item]
+    start = plan.store_offsets[item_store]
+    size = plan.store_offsets[item_store + 1] - start
+    picked = plan.products_by_store[start + (rng.random(len(order_of_item)) * size).astype(np.int64)]
+    product = np.where(is_first, first[order_of_item], picked)
+
+    quantity = rng.integers(1, 4, len(product))
+    unit_price = plan.effective_price(product)
+    line_total = np.round(unit_price * quantity, 2)
+    total = np.bincount(order_of_item, weights=line_total, minlength=n)
+    points = np.bincount(order_of_item, weights=plan.product_points[product] * quantity,
+                         minlength=n).astype(np.int64)
+    status = STATUSES[rng.choice(len(STATUSES), n, p=STATUS_WEIGHTS)]
+    payment = np.where(status == 'cancelled', 'refunded',
+                       np.where(status == 'pending', 'pending', 'paid'))
+    created = timestamps(rng, n)
+    order_ids = seed_ids('order', index)
+    user_ids = seed_ids('user', customer)
+
+    copy_columns(db, 'orders', (
+        'order_id', 'user_id', 'store_id', 'total_amount', 'status', 'payment_status',
+        'payment_method', 'shipping_address', 'shipping_city', 'shipping_phone',
+        'date_created', 'date_updated', 'loyalty_points_earned'
+    ), (
+        order_ids, user_ids, seed_ids('store', store), money(total),
+        status.tolist(), payment.tolist(),
+        PAYMENT_METHODS[rng.integers(0, len(PAYMENT_METHODS), n)].tolist(),
+        [f'{c} Main Boulevard' for c in customer.tolist()],
+        np.asarray(CITIES)[customer % len(CITIES)].tolist(),
+        [f'0300{c:07d}' for c in customer.tolist()],
+        created, created, points.astype(str).tolist()
+    ))
+
+    # At most four items per order, so (order << 2 | position) is unique
+    position = np.arange(len(product)) - np.repeat(np.cumsum(per_order) - per_order, per_order)
+    item_index = (index[order_of_item] << 2) + position
+    copy_columns(db, 'order_items', (
+        'order_item_id', 'order_id', 'product_id', 'quantity', 'unit_price', 'total_price'
+    ), (
+        seed_ids('order_item', item_index),
+        np.asarray(order_ids, dtype=object)[order_of_item].tolist(),
+        seed_ids('product', product),
+        quantity.astype(str).tolist(),
+        money(unit_price),
+        money(line_total)
+    ))
+
+    earned = (status == 'delivered') & (points > 0)
+    copy_columns(db, 'loyalty_points_transactions', (
+        'transaction_id', 'user_id', 'order_id', 'points', 'transaction_type',
+        'description', 'date_created'
+    ), (
+        seed_ids('loyalty', index[earned]),
+        np.asarray(user_ids, dtype=object)[earned].tolist(),
+        np.asarray(order_ids, dtype=object)[earned].tolist(),
+        points[earned].astype(str).tolist(),
+        ['earned'] * int(earned.sum()),
+        ['Points earned on order'] * int(earned.sum()),
+        np.asarray(created, dtype=object)[earned].tolist()
+    ))
+
+def gen_reviews(plan, rng, db, lo, hi):
+    index = np.arange(lo, hi)
+    n = len(index)
+    copy_columns(db, 'reviews', (
+        'review_id', 'product_id', 'user_id', 'rating', 'comment', 'date_created',
+        'is_verified_purchase'
+    ), (
+        seed_ids('review', index),
+        seed_ids('product', plan.product_popularity.draw(rng, n)),
+        seed_ids('user', plan.stores + plan.customer_activity.draw(rng, n)),
+        (rng.choice(5, n, p=RATING_WEIGHTS) + 1).astype(str).tolist(),
+        _text(np.asarray(COMMENTS, dtype=object)[rng.integers(0, len(COMMENTS), n)].tolist()),
+        timestamps(rng, n),
+        np.where(rng.random(n) < 0.7, 't', 'f').tolist()
+    ))
+
+def gen_store_reviews(plan, rng, db, lo, hi):
+    index = np.arange(lo, hi)
+    n = len(index)
+    copy_columns(db, 'store_reviews', (
+        'review_id', 'store_id', 'user_id', 'rating', 'comment', 'date_created'
+    ), (
+        seed_ids('store_review', index),
+        seed_ids('store', plan.store_popularity.draw(rng, n)),
+        seed_ids('user', plan.stores + plan.customer_activity.draw(rng, n)),
+        (rng.choice(5, n, p=RATING_WEIGHTS) + 1).astype(str).tolist(),
+        _text(np.asarray(COMMENTS, dtype=object)[rng.integers(0, len(COMMENTS), n)].tolist()),
+        timestamps(rng, n)
+    ))
+
+def _lists(plan, rng, db, lo, hi, kind, max_items):
+    """Carts or wishlists for customers [lo, hi) with Zipf-picked, deduplicated items"""
+    index = np.arange(lo, hi)
+    n = len(index)
+    owner_ids = seed_ids(kind, index)
+    copy_columns(db, 'cart' if kind == 'cart' else 'wishlist', (
+        f'{kind}_id', 'user_id', 'date_created'
+    ), (
+        owner_ids, seed_ids('user', plan.stores + index), timestamps(rng, n)
+    ))
+
+    per_owner = rng.integers(1, max_items + 1, n)
+    owner = np.repeat(np.arange(n), per_owner)
+    product = plan.product_popularity.draw(rng, len(owner))
+    # One row per (list, product), as the unique indexes require
+    key = np.unique(owner.astype(np.int64) * plan.products + product)
+    owner, product = key // plan.products, key % plan.products
+
+    columns = [
+        seed_ids(f'{kind}_item', index[owner] * plan.products + product),
+        np.asarray(owner_ids, dtype=object)[owner].tolist(),
+        seed_ids('product', product)
+    ]
+    names = [f'{kind}_item_id', f'{kind}_id', 'product_id']
+    if kind == 'cart':
+        columns.append(rng.integers(1, 4, len(owner)).astype(str).tolist())
+        names.append('quantity')
+    columns.append(timestamps(rng, len(owner)))
+    names.append('date_added')
+    copy_columns(db, 'cart_items' if kind == 'cart' else 'wishlist_items', names, columns)
+
+def gen_carts(plan, rng, db, lo, hi):
+    _lists(plan, rng, db, lo, hi, 'cart', 5)
+
+def gen_wishlists(plan, rng, db, lo, hi):
+    _lists(plan, rng, db, lo, hi, 'wishlist', 12)
+
+GENERATORS = {
+    'users': gen_users,
+    'stores': gen_suppliers_and_stores,
+    'products': gen_products,
+    'orders': gen_orders,
+    'reviews': gen_reviews,
+    'store_reviews': gen_store_reviews,
+    'carts': gen_carts,
+    'wishlists': gen_wishlists
+}
+TABLE_CODES = {name: code for code, name in enumerate(GENERATORS, start=1)}
+
+# Set in the parent before the pool forks
+_plan = None
+_db = None
+
+def _worker_init():
+    global _db
+    _db = connect()
+
+def _load_chunk(task):
+    table, number, lo, hi = task
+    rng = np.random.default_rng([_plan.seed, TABLE_CODES[table], number])
+    try:
+        GENERATORS[table](_plan, rng, _db, lo, hi)
+        _db.commit()
+    except Exception:
+        _db.rollback()
+        raise
+    return table, hi - lo
+
+FINALIZE = [
+    ('loyalty balances', BALANCE_UPSERT.format(source='loyalty_points_transactions')),
+    ('user points', """
+        UPDATE users u SET loyalty_points = b.balance
+        FROM loyalty_balances b
+        WHERE u.user_id = b.user_id
+    """),
+    ('product ratings', """
+        UPDATE products p SET avg_rating = r.avg_rating
+        FROM (SELECT product_id, ROUND(AVG(rating), 2) AS avg_rating FROM reviews GROUP BY product_id) r
+        WHERE p.product_id = r.product_id
+    """),
+    ('store ratings', """
+        UPDATE stores s SET avg_rating = r.avg_rating
+        FROM (SELECT store_id, ROUND(AVG(rating), 2) AS avg_rating FROM store_reviews GROUP BY store_id) r
+        WHERE s.store_id = r.store_id
+    """),
+    ('analyze', "ANALYZE")
+]
+
+def seed(plan, jobs):
+    global _plan
+    _plan = plan
+    # One hash shared by every seeded user keeps generation fast while
+    # logins still pay the real verification cost
+    plan.password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    # Each phase only references rows loaded by earlier phases
+    phases = [
+        [('users', plan.users)],
+        [('stores', plan.stores)],
+        [('products', plan.products)],
+        [('orders', plan.orders), ('reviews', plan.reviews),
+         ('store_reviews', plan.store_reviews), ('carts', plan.carts),
+         ('wishlists', plan.wishlists)]
+    ]
+
+    context = multiprocessing.get_context('fork')
+    with context.Pool(jobs, initializer=_worker_init) as pool:
+        for phase in phases:
+            tasks = [task for table, total in phase for task in plan.chunks(table, total)]
+            started = time.perf_counter()
+            rows = dict.fromkeys((table for table, _ in phase), 0)
+            for table, count in pool.imap_unordered(_load_chunk, tasks):
+                rows[table] += count
+            elapsed = time.perf_counter() - started
+            for table, count in rows.items():
+                print(f"  {table:<14} {count:>12,} rows")
+            print(f"  {'':<14} {elapsed:>11.1f}s")
+
+    db = connect()
+    try:
+        with db.cursor() as cursor:
+            for label, sql in FINALIZE:
+                started = time.perf_counter()
+                cursor.execute(sql)
+                db.commit()
+                print(f"  {label:<20} {time.perf_counter() - started:6.1f}s")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply every table size by this factor')
+    parser.add_argument('--stores', type=int, default=10000)
+    parser.add_argument('--customers', type=int, default=500000)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--orders', type=int, default=5000000)
+    parser.add_argument('--reviews', type=int, default=2000000)
+    parser.add_argument('--store-reviews', type=int, default=300000)
+    parser.add_argument('--carts', type=int, default=100000)
+    parser.add_argument('--wishlists', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 2,
+                        help='parallel COPY workers (does not change the data)')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--yes', action='store_true',
+                        help='confirm the configured database is a scratch database')
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error('seeding writes to the configured database, pass --yes to confirm')
+
+    for name in ('stores', 'customers', 'products', 'orders', 'reviews',
+                 'store_reviews', 'carts', 'wishlists'):
+        setattr(args, name, max(1, int(getattr(args, name) * args.scale)))
+
+    started = time.perf_counter()
+    plan = Plan(args)
+    print(f"Planned {plan.users:,} users, {plan.stores:,} stores, {plan.products:,} products, "
+          f"{plan.orders:,} orders in {time.perf_counter() - started:.1f}s")
+    seed(plan, args.jobs)
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -26,8 +26,10 @@ def role_required(*roles):
             verify_jwt_in_request()
             user_id = get_jwt_identity()
             
-            # Get user role from database - for now just use a placeholder
-            user_role = "customer"  # Placeholder, replace with actual DB lookup
+            # Get user role from database
+            from models.user import User
+            user = User.get_by_id(user_id)
+            user_role = user['role'] if user and user['is_active'] else None
             
             if user_role not in roles:
                 return jsonify({
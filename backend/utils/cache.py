@@ -0,0 +1,129 @@
+from flask import g, has_request_context
+from collections import OrderedDict
+from utils.invalidation import bus
+import functools
+import threading
+import time
+import os
+
+# Sentinel returned by TTLCache.get on a miss, so None can be cached
+MISSING = object()
+
+# Every named cache, for the metrics endpoint
+registry = []
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            registry.append(self)
+            bus.subscribe(name, self._evict)
+
+    def get(self, key):
+        """Get a cached value, or MISSING if absent or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Cache a value, evicting the least recently used entry when full"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a key from the cache if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self, key):
+        """Remove a key here and, for named caches, in every other worker"""
+        self.delete(key)
+        if self.name:
+            bus.publish(self.name, key)
+
+    def _evict(self, key):
+        # Applied for invalidations received from other workers
+        if key is None:
+            self.clear()
+        else:
+            self.delete(key)
+
+    def __len__(self):
+        return len(self._data)
+
+# Where @cached lookups are memoized unless a decorator says otherwise:
+# 'process' shares entries across requests (bounded by TTL and size),
+# 'request' only deduplicates lookups within one request
+MODEL_CACHE_SCOPE = os.getenv('MODEL_CACHE_SCOPE', 'process')
+
+def cached(name, ttl=60, maxsize=4096, negative_ttl=5, scope=None):
+    """Read-through cache for single-key model lookups
+
+    Wraps a function of one argument (an id) that returns a row or None.
+    Rows are cached for `ttl` seconds, misses (None) for `negative_ttl`;
+    callers get a shallow copy so they can modify it freely. The wrapper
+    exposes invalidate(key), which the model's write methods call.
+    """
+    scope = scope or MODEL_CACHE_SCOPE
+    cache = TTLCache(maxsize=maxsize, ttl=ttl, name=name) if scope == 'process' else None
+
+    def decorator(fn):
+        def _store():
+            if cache is not None:
+                return cache
+            if not has_request_context():
+                return None
+            return g.setdefault('model_cache', {}).setdefault(name, {})
+
+        @functools.wraps(fn)
+        def wrapper(key):
+            store = _store()
+            if store is None:
+                return fn(key)
+            value = store.get(key, MISSING) if cache is None else store.get(key)
+            if value is MISSING:
+                value = fn(key)
+                if cache is not None:
+                    cache.set(key, value, ttl=None if value is not None else negative_ttl)
+                else:
+                    store[key] = value
+            return dict(value) if value is not None else None
+
+        def invalidate(key):
+            if cache is not None:
+                cache.invalidate(key)
+            elif has_request_context():
+                g.get('model_cache', {}).get(name, {}).pop(key, None)
+
+        wrapper.invalidate = invalidate
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
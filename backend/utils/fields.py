@@ -0,0 +1,13 @@
+def parse_fields(raw, allowed, always=()):
+    """Parse a comma-separated `fields` parameter against a whitelist
+
+    Returns (fields, unknown): the selected names in whitelist order with
+    `always` included, or None when no fields were requested; and the
+    requested names that are not allowed.
+    """
+    if not raw:
+        return None, []
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = sorted(requested.difference(allowed))
+    requested.update(always)
+    return tuple(name for name in allowed if name in requested), unknown
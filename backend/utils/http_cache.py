@@ -0,0 +1,86 @@
+from flask import request
+import hashlib
+import gzip
+import os
+
+# brotli is optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is, compressing them costs more than it saves
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+def _choose_encoding():
+    """Pick the best encoding the client accepts"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def add_etag(response):
+    """Add a weak ETag and answer 304 when the client already has the body
+
+    Views that know a version for their data can set the ETag themselves
+    (response.set_etag); otherwise it is a hash of the body.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if response.is_streamed or response.direct_passthrough:
+        return response
+
+    if not response.headers.get('ETag'):
+        digest = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+        response.set_etag(digest, weak=True)
+
+    if 'Cache-Control' not in response.headers:
+        # Always revalidate; the ETag makes revalidation cheap
+        response.headers['Cache-Control'] = 'private, no-cache' if request.headers.get('Authorization') else 'no-cache'
+
+    return response.make_conditional(request)
+
+def compress(response):
+    """Compress large bodies with brotli or gzip"""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers:
+        return response
+    # Streamed bodies (e.g. the CSV export) are left alone so they are never
+    # buffered just to be compressed
+    if response.is_streamed or response.direct_passthrough:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = _choose_encoding()
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_app(app):
+    """Register conditional GET and compression on every response"""
+    # after_request handlers run in reverse registration order, so the ETag
+    # is computed on the uncompressed body before compression
+    app.after_request(compress)
+    app.after_request(add_etag)
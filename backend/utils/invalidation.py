@@ -0,0 +1,173 @@
+from flask import g, has_request_context
+import psycopg2
+import psycopg2.extensions
+import threading
+import logging
+import select
+import socket
+import uuid
+import json
+import time
+import os
+from database.db import connect
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'cache_invalidation'
+
+# 'notify' broadcasts evictions to every worker, 'off' keeps them local
+CACHE_INVALIDATION = os.getenv('CACHE_INVALIDATION', 'notify')
+
+# pg_notify payloads are limited to 8000 bytes
+MAX_PAYLOAD = 7000
+LISTEN_POLL_SECONDS = 5
+MAX_RECONNECT_DELAY = 30
+
+class InvalidationBus:
+    """Cross-worker cache eviction over Postgres LISTEN/NOTIFY
+
+    Caches subscribe an evict(key) callback under their name. Writers call
+    publish(name, key) after evicting locally; within a request the keys
+    are collected and sent in one NOTIFY when the request ends, otherwise
+    immediately. Every worker process runs one listener thread on its own
+    connection that applies the evictions published by other workers.
+    After the listener reconnects, notifications may have been missed, so
+    every subscribed cache is cleared.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._pid = None
+        self._origin_pid = None
+        self._origin = None
+        self._publisher = None
+        self._lock = threading.Lock()
+
+    @property
+    def origin(self):
+        """Id of this process, so its own notifications can be skipped"""
+        if self._origin_pid != os.getpid():
+            self._origin_pid = os.getpid()
+            self._origin = f"{socket.gethostname()}:{self._origin_pid}:{uuid.uuid4().hex[:8]}"
+            # A connection inherited from a pre-fork master is not ours to use
+            self._publisher = None
+        return self._origin
+
+    def subscribe(self, name, evict):
+        """Register evict(key) for a cache; key None means clear everything"""
+        self._subscribers[name] = evict
+
+    def publish(self, name, key):
+        """Tell the other workers to evict `key` from cache `name`"""
+        if CACHE_INVALIDATION == 'off':
+            return
+        if has_request_context():
+            g.setdefault('invalidations', []).append((name, key))
+        else:
+            self._send([(name, key)])
+
+    def publish_many(self, name, keys):
+        """publish() for several keys of one cache, in as few NOTIFYs as possible"""
+        if CACHE_INVALIDATION == 'off' or not keys:
+            return
+        entries = [(name, key) for key in keys]
+        if has_request_context():
+            g.setdefault('invalidations', []).extend(entries)
+        else:
+            self._send(entries)
+
+    def flush(self, error=None):
+        """Send the invalidations collected during the request"""
+        pending = g.pop('invalidations', None)
+        if pending:
+            self._send(pending)
+
+    def ensure_started(self):
+        """Start this process's listener (once per worker, after fork)"""
+        if self._pid == os.getpid() or CACHE_INVALIDATION == 'off':
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._listen, name='cache-invalidation', daemon=True).start()
+
+    def _payloads(self, entries):
+        entries = list(dict.fromkeys(entries))
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(json.dumps(batch)) > MAX_PAYLOAD and len(batch) > 1:
+                batch.pop()
+                yield json.dumps({'o': self.origin, 'e': batch})
+                batch = [entry]
+        if batch:
+            yield json.dumps({'o': self.origin, 'e': batch})
+
+    def _send(self, entries):
+        payloads = list(self._payloads(entries))
+        with self._lock:
+            try:
+                if self._publisher is None or self._publisher.closed:
+                    self._publisher = connect()
+                    self._publisher.autocommit = True
+                with self._publisher.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                    for payload in payloads:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+            except psycopg2.Error:
+                # Other workers fall back to their cache TTLs
+                logger.exception("Publishing %d cache invalidations failed", len(entries))
+                self._publisher = None
+
+    def _receive(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation: %s", payload[:200])
+            return
+        if message.get('o') == self.origin:
+            return
+        for name, key in message.get('e', []):
+            evict = self._subscribers.get(name)
+            if evict is not None:
+                evict(key)
+
+    def _evict_all(self):
+        for evict in list(self._subscribers.values()):
+            evict(None)
+
+    def _listen(self):
+        delay = 1
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                conn.autocommit = True
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                if connected_before:
+                    self._evict_all()
+                connected_before = True
+                delay = 1
+
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.warning("Cache invalidation listener disconnected, retrying in %ds", delay, exc_info=True)
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+bus = InvalidationBus()
+
+def init_app(app):
+    """Start the listener in each worker and send invalidations after each request"""
+    app.before_request(bus.ensure_started)
+    app.teardown_appcontext(bus.flush)
@@ -0,0 +1,66 @@
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from datetime import date
+import decimal
+import os
+import uuid
+
+# orjson is optional; without it the stdlib provider is used unchanged
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(o):
+    """Encode the types orjson does not handle the way Flask does"""
+    # Same representations as DefaultJSONProvider, so switching backends
+    # never changes the API output
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes with orjson when it is installed
+
+    RealDictCursor rows, Decimal prices and datetime columns are encoded
+    natively in C. Output matches DefaultJSONProvider (sorted keys,
+    Decimal as string, dates as HTTP dates). Falls back to the stdlib
+    encoder when orjson is missing, JSON_BACKEND=stdlib is set, or a call
+    passes json.dumps keyword arguments.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and os.getenv('JSON_BACKEND', 'orjson') != 'stdlib'
+
+    def _options(self):
+        # OPT_PASSTHROUGH_DATETIME hands dates to _default, keeping the
+        # HTTP-date format instead of orjson's ISO 8601
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if not self.use_orjson or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not self.use_orjson or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Build the body as bytes directly, skipping a decode/encode round trip
+        body = orjson.dumps(obj, default=_default, option=self._options()) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
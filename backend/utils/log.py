@@ -0,0 +1,174 @@
+from flask import request, g, has_request_context
+from flask.logging import default_handler
+import logging.handlers
+import logging
+import atexit
+import random
+import queue
+import json
+import time
+import uuid
+import sys
+import os
+import re
+from utils.metrics import metrics
+
+# Root level, plus optional per-logger overrides: "models.cart=DEBUG,werkzeug=WARNING"
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+
+# Share of requests whose INFO/DEBUG records (including the access line) are
+# kept, by default and per "METHOD /route": "GET /api/products=0.01".
+# Warnings and errors are always kept.
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+
+# Records waiting for the writer thread; beyond this they are dropped
+# rather than making a request wait on the output stream
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+metrics.describe('log_records_dropped_total', 'counter', 'Log records dropped because the queue was full.')
+
+def _parse_pairs(spec):
+    pairs = {}
+    for item in spec.split(','):
+        if '=' in item:
+            key, value = item.rsplit('=', 1)
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+SAMPLE_RATES = {route: float(rate) for route, rate in _parse_pairs(LOG_SAMPLE_RATES).items()}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with request fields and any `extra` values"""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without formatting or I/O
+
+    The calling thread only merges the message arguments (so later
+    mutation of a logged object cannot change the line), stamps the
+    request fields and enqueues; formatting and the write happen on the
+    listener thread. Records of unsampled requests below WARNING are
+    dropped here.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            if record.levelno < logging.WARNING and not g.get('log_sampled', True):
+                return False
+            if not hasattr(record, 'request_id'):
+                record.request_id = g.get('request_id')
+        return super().filter(record)
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc('log_records_dropped_total')
+
+class _Logging:
+    """The process-wide queue, handler and writer thread"""
+
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+
+    def configure(self):
+        if self.handler is not None:
+            return
+        self.handler = RequestQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in _parse_pairs(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level.upper())
+
+        self._start()
+        atexit.register(self._stop)
+        # A listener thread started in a pre-fork master does not exist in
+        # the workers; give each child its own queue and writer
+        os.register_at_fork(after_in_child=self._restart)
+
+    def _start(self):
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JSONFormatter())
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+        self.listener.start()
+
+    def _restart(self):
+        self.handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        self._start()
+
+    def _stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+logs = _Logging()
+
+access_logger = logging.getLogger('access')
+
+def sample_rate(method, rule):
+    return SAMPLE_RATES.get(f"{method} {rule}", LOG_SAMPLE_RATE)
+
+def start_request():
+    g.log_started = time.perf_counter()
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = request_id if _VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+    rule = request.url_rule.rule if request.url_rule else request.path
+    rate = sample_rate(request.method, rule)
+    g.log_sampled = rate >= 1 or random.random() < rate
+
+def log_request(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    started = g.get('log_started')
+    if started is not None and g.get('log_sampled', True):
+        access_logger.info(
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra={
+                'route': request.url_rule.rule if request.url_rule else None,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+        )
+    return response
+
+def init_app(app):
+    """Route all logging through the background writer and tag records with request ids"""
+    logs.configure()
+    app.logger.removeHandler(default_handler)
+    app.before_request(start_request)
+    app.after_request(log_request)
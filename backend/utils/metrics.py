@@ -0,0 +1,350 @@
+from flask import request, g, Response
+from bisect import bisect_left
+import threading
+import logging
+import fcntl
+import hmac
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (the +Inf bucket is implicit)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Bearer token required to scrape /metrics; without one the endpoint is
+# closed unless METRICS_PUBLIC=true
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+
+# Directory shared by the worker processes of one server (set by
+# gunicorn.conf.py). Each worker writes its values there every
+# METRICS_DUMP_INTERVAL seconds and /metrics sums every worker's file.
+# Unset, a single process only reports its own values.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_DUMP_INTERVAL = float(os.getenv('METRICS_DUMP_INTERVAL', 5))
+
+DEAD_FILE = 'dead.json'
+
+class Metrics:
+    """Low-overhead in-process metrics with Prometheus text exposition
+
+    Every thread records into its own shard of plain dicts and lists, so
+    observing a value takes no lock; only the first observation of a new
+    thread registers its shard. Shards are summed when /metrics is scraped.
+    Histograms are pre-bucketed: an observation is one bisect and two adds.
+
+    With METRICS_DIR set, every process also writes its totals to
+    <pid>.json in that directory, and render() sums all of them, so a
+    scrape reports the whole server whichever worker answers it. When a
+    worker exits its counters and histograms are folded into dead.json
+    (its gauges are dropped), so totals never go down.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=METRICS_DIR):
+        self.buckets = buckets
+        self.directory = directory
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._collectors = []
+        self._derived = []
+        self._dump_pid = None
+        # Values recorded before a fork belong to the parent
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, metric_type, help_text):
+        """Declare the TYPE and HELP lines of a metric"""
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {'histograms': {}, 'counters': {}}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def observe(self, name, labels, value):
+        """Record a value in a histogram; labels is a tuple of (name, value) pairs"""
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        hist = histograms.get(key)
+        if hist is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            hist = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        hist[bisect_left(self.buckets, value)] += 1
+        hist[-1] += value
+
+    def inc(self, name, labels=(), amount=1):
+        """Add to a counter, or to an up/down gauge when amount is negative"""
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def collector(self, fn):
+        """Register a callback returning [(name, labels, value)] sampled at scrape time"""
+        self._collectors.append(fn)
+        return fn
+
+    def derived(self, fn):
+        """Register a callback computing [(name, labels, value)] from the summed counters"""
+        self._derived.append(fn)
+        return fn
+
+    def _merged(self):
+        histograms = {}
+        counters = {}
+        for shard in list(self._shards):
+            # dict() copies in one step, so a concurrent insert by the owning
+            # thread cannot break the iteration
+            for key, hist in dict(shard['histograms']).items():
+                total = histograms.setdefault(key, [0] * len(hist))
+                for i, value in enumerate(list(hist)):
+                    total[i] += value
+            for key, value in dict(shard['counters']).items():
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def _snapshot(self):
+        histograms, counters = self._merged()
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                counters[(name, labels)] = value
+        return histograms, counters
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, data):
+        # Written aside and renamed, so readers never see a partial file
+        tmp = self._path(f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(name))
+
+    def _read(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def dump(self):
+        """Write this process's totals to the shared directory"""
+        if not self.directory:
+            return
+        histograms, counters = self._snapshot()
+        self._write(f'{os.getpid()}.json', {
+            'histograms': [[name, labels, hist] for (name, labels), hist in histograms.items()],
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()]
+        })
+
+    def ensure_dumping(self):
+        """Start this process's dump thread (once per worker, after fork)"""
+        if not self.directory or self._dump_pid == os.getpid():
+            return
+        with self._lock:
+            if self._dump_pid == os.getpid():
+                return
+            self._dump_pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(target=self._dump_loop, name='metrics-dump', daemon=True).start()
+
+    def _dump_loop(self):
+        while True:
+            time.sleep(METRICS_DUMP_INTERVAL)
+            try:
+                self.dump()
+            except Exception:
+                logger.exception("Writing metrics to %s failed", self.directory)
+
+    def mark_process_dead(self, pid):
+        """Fold an exited worker's counters and histograms into dead.json"""
+        if not self.directory:
+            return
+        name = f'{pid}.json'
+        data = self._read(name)
+        if data is None:
+            return
+        with open(self._path('.dead.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = self._read(DEAD_FILE) or {'histograms': [], 'counters': [], 'pids': []}
+            histograms, counters = _load(dead)
+            _add(histograms, counters, data, skip=self._gauge)
+            # Listing the pid lets readers skip its file until it is removed
+            pids = [p for p in dead['pids'] if os.path.exists(self._path(f'{p}.json'))]
+            self._write(DEAD_FILE, {
+                'histograms': [[n, l, h] for (n, l), h in histograms.items()],
+                'counters': [[n, l, v] for (n, l), v in counters.items()],
+                'pids': pids + [pid]
+            })
+            os.remove(self._path(name))
+
+    def _gauge(self, name):
+        return self._types.get(name) == 'gauge'
+
+    def _collect_all(self):
+        # Write our own file first: every process, including this one, is
+        # then read from its file, so totals cannot go backwards between
+        # scrapes answered by different workers
+        self.dump()
+        histograms, counters = {}, {}
+        dead = self._read(DEAD_FILE)
+        skip = set()
+        if dead is not None:
+            _add(histograms, counters, dead)
+            skip = {f'{pid}.json' for pid in dead['pids']}
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') and name != DEAD_FILE and name not in skip and not name.startswith('.'):
+                data = self._read(name)
+                if data is not None:
+                    _add(histograms, counters, data)
+        return histograms, counters
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        if self.directory:
+            histograms, counters = self._collect_all()
+        else:
+            histograms, counters = self._snapshot()
+        for derive in self._derived:
+            for name, labels, value in derive(counters):
+                counters[(name, labels)] = value
+
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), hist in histograms.items():
+            lines = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), hist):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(_sample(f'{name}_bucket', labels + (('le', le),), cumulative))
+            lines.append(_sample(f'{name}_sum', labels, hist[-1]))
+            lines.append(_sample(f'{name}_count', labels, cumulative))
+
+        output = []
+        for name in sorted(by_name):
+            if name in self._help:
+                output.append(f'# HELP {name} {self._help[name]}')
+                output.append(f'# TYPE {name} {self._types[name]}')
+            output.extend(by_name[name])
+        return '\n'.join(output) + '\n'
+
+def _key(name, labels):
+    # Labels round-trip through JSON as lists of lists
+    return name, tuple(tuple(pair) for pair in labels)
+
+def _load(data):
+    histograms, counters = {}, {}
+    _add(histograms, counters, data)
+    return histograms, counters
+
+def _add(histograms, counters, data, skip=None):
+    """Sum a dumped file into histograms and counters"""
+    for name, labels, hist in data['histograms']:
+        key = _key(name, labels)
+        total = histograms.setdefault(key, [0] * len(hist))
+        for i, value in enumerate(hist):
+            total[i] += value
+    for name, labels, value in data['counters']:
+        if skip is None or not skip(name):
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _sample(name, labels, value):
+    if labels:
+        rendered = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+        return f'{name}{{{rendered}}} {value}'
+    return f'{name} {value}'
+
+metrics = Metrics()
+
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by route.')
+metrics.describe('http_requests_total', 'counter', 'Requests by route and status code.')
+metrics.describe('http_requests_in_flight', 'gauge', 'Requests currently being handled.')
+metrics.describe('db_request_duration_seconds', 'histogram', 'Time spent in SQL per request.')
+metrics.describe('db_connections_in_use', 'gauge', 'Request-scoped database connections currently open.')
+metrics.describe('cache_hits_total', 'counter', 'In-process cache hits.')
+metrics.describe('cache_misses_total', 'counter', 'In-process cache misses.')
+metrics.describe('cache_hit_ratio', 'gauge', 'In-process cache hit ratio.')
+metrics.describe('cache_entries', 'gauge', 'Entries held by in-process caches.')
+
+@metrics.collector
+def _cache_samples():
+    from utils.cache import registry
+    samples = []
+    for cache in list(registry):
+        labels = (('cache', cache.name),)
+        samples.append(('cache_hits_total', labels, cache.hits))
+        samples.append(('cache_misses_total', labels, cache.misses))
+        samples.append(('cache_entries', labels, len(cache)))
+    return samples
+
+@metrics.derived
+def _cache_ratios(counters):
+    # From the totals of every worker, so computed after summing
+    ratios = []
+    for (name, labels), hits in list(counters.items()):
+        if name == 'cache_hits_total':
+            lookups = hits + counters.get(('cache_misses_total', labels), 0)
+            ratios.append(('cache_hit_ratio', labels, round(hits / lookups, 4) if lookups else 0))
+    return ratios
+
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    return (('blueprint', request.blueprint or ''), ('route', rule), ('method', request.method))
+
+def start_timer():
+    metrics.ensure_dumping()
+    g.metrics_started = time.perf_counter()
+    metrics.inc('http_requests_in_flight')
+
+def record_request(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        labels = _route_labels()
+        metrics.observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+        metrics.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        stats = g.get('query_stats')
+        if stats is not None:
+            metrics.observe('db_request_duration_seconds', labels, stats.total)
+    return response
+
+def finish_request(error=None):
+    if g.pop('metrics_started', None) is not None:
+        metrics.inc('http_requests_in_flight', amount=-1)
+
+def metrics_endpoint():
+    """Expose the metrics in Prometheus text format"""
+    if METRICS_TOKEN:
+        # Compared as bytes, compare_digest rejects non-ASCII str
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                   f'Bearer {METRICS_TOKEN}'.encode()):
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+    elif not METRICS_PUBLIC:
+        return Response('Set METRICS_TOKEN (or METRICS_PUBLIC=true) to enable /metrics\n',
+                        status=403, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """Record per-route metrics and serve them at /metrics"""
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.teardown_request(finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
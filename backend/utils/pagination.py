@@ -0,0 +1,19 @@
+import base64
+import json
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row into an opaque keyset cursor"""
+    raw = json.dumps([str(v) for v in values]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a keyset cursor, returns None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return values
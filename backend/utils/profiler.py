@@ -0,0 +1,246 @@
+from flask import request
+from collections import Counter
+import threading
+import logging
+import random
+import json
+import time
+import uuid
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+
+# Directory shared by the worker processes of one server (set by
+# gunicorn.conf.py). The profiler state is kept there so start/stop/reset
+# reach every worker, and each worker writes its samples there so results
+# cover all of them. Unset, the profiler only covers its own process.
+PROFILER_DIR = os.getenv('PROFILER_DIR')
+# How often a worker re-reads the shared state (while handling requests)
+# and writes its samples (while sampling)
+PROFILER_SYNC_INTERVAL = float(os.getenv('PROFILER_SYNC_INTERVAL', 2))
+
+STATE_FILE = 'state.json'
+
+class SamplingProfiler:
+    """On-demand statistical profiler for live requests
+
+    When enabled, a share (`rate`) of requests is marked for sampling and a
+    background thread snapshots the stacks of the marked request threads
+    every `interval` seconds via sys._current_frames(). Samples are
+    aggregated per route as collapsed stacks ("frame;frame;frame count"),
+    the input format of flamegraph.pl and speedscope. While disabled the
+    request hook is a couple of attribute checks and no thread runs.
+
+    With a shared directory, start/stop/reset write state.json, which
+    every worker picks up within PROFILER_SYNC_INTERVAL of its next
+    request. Workers write their samples to <pid>.json, tagged with the
+    epoch of the last reset, and results sum the files of the current
+    epoch, whichever worker serves the request.
+    """
+
+    def __init__(self, directory=PROFILER_DIR):
+        self.directory = directory
+        self.enabled = False
+        self.rate = 0.0
+        self.interval = 0.005
+        self.epoch = None
+        self._next_sync = 0.0
+        self._active = {}
+        self._stacks = {}
+        self._requests = Counter()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, rate=0.01, interval=0.005):
+        """Enable sampling of `rate` (0-1) of requests every `interval` seconds"""
+        self._update(
+            enabled=True,
+            rate=min(max(rate, 0.0), 1.0),
+            interval=max(interval, 0.001)
+        )
+
+    def stop(self):
+        """Disable sampling, keeping what was collected so far"""
+        self._update(enabled=False)
+
+    def reset(self):
+        """Drop all collected samples"""
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json') and name != STATE_FILE:
+                    os.remove(os.path.join(self.directory, name))
+        self._update(epoch=uuid.uuid4().hex[:8])
+
+    def _state(self):
+        return {'enabled': self.enabled, 'rate': self.rate, 'interval': self.interval, 'epoch': self.epoch}
+
+    def _update(self, **changes):
+        self._sync()
+        state = dict(self._state(), **changes)
+        if state['epoch'] is None:
+            state['epoch'] = uuid.uuid4().hex[:8]
+        if self.directory:
+            _write_json(os.path.join(self.directory, STATE_FILE), state)
+        self._apply(state)
+
+    def _sync(self):
+        """Adopt the shared state if another worker changed it"""
+        self._next_sync = time.monotonic() + PROFILER_SYNC_INTERVAL
+        if not self.directory:
+            return
+        try:
+            state = _read_json(os.path.join(self.directory, STATE_FILE))
+        except ValueError:
+            logger.warning("Ignoring unreadable profiler state in %s", self.directory)
+            return
+        if state is not None and state != self._state():
+            self._apply(state)
+
+    def _apply(self, state):
+        with self._lock:
+            if state['epoch'] != self.epoch:
+                self._stacks = {}
+                self._requests = Counter()
+                self.epoch = state['epoch']
+            self.rate = state['rate']
+            self.interval = state['interval']
+            self.enabled = state['enabled']
+            if not self.enabled:
+                self._active.clear()
+            elif self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def begin_request(self):
+        if self.directory and time.monotonic() >= self._next_sync:
+            self._sync()
+        if not self.enabled or random.random() >= self.rate:
+            return
+        route = request.url_rule.rule if request.url_rule else request.path
+        route = f"{request.method} {route}"
+        self._active[threading.get_ident()] = route
+        self._requests[route] += 1
+
+    def end_request(self, error=None):
+        if self._active:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        own = threading.get_ident()
+        next_dump = time.monotonic() + PROFILER_SYNC_INTERVAL
+        while self.enabled:
+            time.sleep(self.interval)
+            if time.monotonic() >= next_dump:
+                next_dump = time.monotonic() + PROFILER_SYNC_INTERVAL
+                self._dump()
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, route in list(self._active.items()):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own:
+                    continue
+                stack = _collapse(frame)
+                counts = self._stacks.get(route)
+                if counts is None:
+                    counts = self._stacks.setdefault(route, Counter())
+                counts[stack] += 1
+            del frames
+        self._dump()
+
+    def _dump(self):
+        """Write this worker's samples to the shared directory"""
+        if not self.directory or not self._requests:
+            return
+        try:
+            _write_json(os.path.join(self.directory, f'{os.getpid()}.json'), {
+                'epoch': self.epoch,
+                'requests': dict(self._requests),
+                'stacks': {route: dict(counts) for route, counts in list(self._stacks.items())}
+            })
+        except OSError:
+            logger.exception("Writing profiler samples to %s failed", self.directory)
+
+    def _collected(self):
+        """(stacks, requests, workers) of the current epoch across all workers"""
+        if not self.directory:
+            return self._stacks, self._requests, 1
+        self._sync()
+        self._dump()
+        stacks, requests, workers = {}, Counter(), 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == STATE_FILE or name.startswith('.'):
+                continue
+            try:
+                data = _read_json(os.path.join(self.directory, name))
+            except ValueError:
+                continue
+            if data is None or data['epoch'] != self.epoch:
+                continue
+            workers += 1
+            requests.update(data['requests'])
+            for route, counts in data['stacks'].items():
+                stacks.setdefault(route, Counter()).update(counts)
+        return stacks, requests, workers
+
+    def status(self):
+        """Summary of the profiler state and samples per route"""
+        stacks, requests, workers = self._collected()
+        return {
+            'enabled': self.enabled,
+            'rate': self.rate,
+            'interval_ms': self.interval * 1000,
+            'workers': workers,
+            'routes': {
+                route: {
+                    'requests': requests.get(route, 0),
+                    'samples': sum(counts.values())
+                }
+                for route, counts in list(stacks.items())
+            }
+        }
+
+    def collapsed(self, route=None):
+        """Collapsed-stack text, optionally for a single route"""
+        stacks, _, _ = self._collected()
+        lines = []
+        for name, counts in sorted(stacks.items()):
+            if route and name != route:
+                continue
+            for stack, count in counts.most_common():
+                lines.append(f"{name};{stack} {count}")
+        return '\n'.join(lines) + '\n'
+
+def _write_json(path, data):
+    # Written aside and renamed, so readers never see a partial file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _collapse(frame):
+    """Render a frame's call stack root-first as 'file:function;...'"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.reverse()
+    return ';'.join(parts)
+
+profiler = SamplingProfiler()
+
+def init_app(app):
+    """Hook the profiler into the request lifecycle (free while disabled)"""
+    app.before_request(profiler.begin_request)
+    app.teardown_request(profiler.end_request)